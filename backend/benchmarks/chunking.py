@@ -0,0 +1,231 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tracemalloc
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from scripts.encoders import EMBEDDING_BACKENDS
+from scripts.chunk import TextChunker, PDFChunker
+
+#####################################################################
+# Benchmark suite of the chunking methods of TextChunker and of the #
+# stages of PDFChunker. Runs offline with a deterministic fake      #
+# encoder and reports throughput, p50/p95 latency, peak memory and  #
+# chunk sizes. Results can be saved and compared with a baseline to #
+# catch ingest regressions.                                         #
+#####################################################################
+
+TEXT_METHODS = {
+    "recursive_chars": ("recursive_chunk", {}),
+    "recursive_tokens": ("recursive_chunk", {"by_tokens": True}),
+    "semantic": ("semantic_chunk", {}),
+    "cluster": ("cluster_chunk", {}),
+    "statistical": ("statistical_chunk", {}),
+    "vectorized_statistical": ("vectorized_statistical_chunk", {}),
+}
+
+WORDS = ("learning model data student question answer chunk page graph node level concept "
+         "theory method result system process value memory network layer function error").split()
+
+
+class FakeEmbeddings(DeterministicFakeEmbedding):
+    """Deterministic random embeddings (seeded by the hash of the text), used to benchmark without network."""
+    model: str = "fake"
+
+
+def generate_text(nb_chars, seed=0):
+    """Generate a synthetic text of about nb_chars characters, made of paragraphs of random sentences."""
+    rng = random.Random(seed)
+    paragraphs, length = [], 0
+    while length < nb_chars:
+        sentences = []
+        for _ in range(rng.randint(3, 8)):
+            words = rng.choices(WORDS, k=rng.randint(6, 20))
+            sentences.append(" ".join(words).capitalize() + ".")
+        paragraph = " ".join(sentences)
+        paragraphs.append(paragraph)
+        length += len(paragraph) + 2
+    return "\n\n".join(paragraphs)
+
+
+def load_corpora(args):
+    """
+    Load the benchmark corpora.
+
+    Returns:
+        dict: The texts, by corpus name.
+    """
+    corpora = {"synthetic": generate_text(args.synthetic_chars, seed=args.seed)}
+
+    if os.path.exists(args.chunks):
+        with open(args.chunks, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        corpora["user_study"] = "\n\n".join(
+            doc["page_content"] for entry in data for doc in entry["formated_chunk"] if doc["metadata"].get("type") != "image"
+        )
+
+    for path in args.text or []:
+        with open(path, "r", encoding="utf-8") as f:
+            corpora[os.path.basename(path)] = f.read()
+
+    return corpora
+
+
+def summarize(latencies, sizes, nb_chars, peak_memory):
+    """Summarize the runs of a benchmark."""
+    latencies = np.array(latencies)
+    sizes = np.array(sizes) if len(sizes) else np.zeros(1)
+    return {
+        "p50_s": float(np.percentile(latencies, 50)),
+        "p95_s": float(np.percentile(latencies, 95)),
+        "chars_per_s": float(nb_chars / np.percentile(latencies, 50)) if nb_chars else None,
+        "peak_mb": peak_memory / 1024 / 1024,
+        "nb_chunks": int(len(sizes)),
+        "size_p50": float(np.percentile(sizes, 50)),
+        "size_p95": float(np.percentile(sizes, 95)),
+        "size_max": int(sizes.max()),
+    }
+
+
+def benchmark_text_method(text, method, kwargs, backend, repeat):
+    """
+    Benchmark a chunking method of TextChunker on a text.
+
+    Args:
+        text (str): The text to chunk.
+        method (str): Name of the TextChunker method.
+        kwargs (dict): Arguments of the method.
+        backend (str): Embedding backend of the chunker.
+        repeat (int): Number of timed runs.
+
+    Returns:
+        dict: Summary of the runs (see summarize).
+    """
+    chunker = TextChunker(text, output_document=False, embedding_backend=backend)
+
+    # First run (not timed) to measure the peak memory and the chunk sizes
+    tracemalloc.start()
+    chunks = getattr(chunker, method)(**kwargs)
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        getattr(chunker, method)(**kwargs)
+        latencies.append(time.perf_counter() - start_time)
+
+    return summarize(latencies, [len(chunk) for chunk in chunks], len(text), peak_memory)
+
+
+def benchmark_pdf(pdf_path, strategy, nb_workers):
+    """
+    Benchmark the stages of PDFChunker on a PDF, from the progress reports of the chunker.
+
+    Returns:
+        dict: Summary of each stage (the latencies of crop and encode are per chunk).
+    """
+    stage_latencies = {}
+    last_report = [time.perf_counter()]
+
+    def progress_callback(stage, done, total):
+        now = time.perf_counter()
+        if done > 0:
+            stage_latencies.setdefault(stage, []).append(now - last_report[0])
+        last_report[0] = now
+
+    tracemalloc.start()
+    chunker = PDFChunker(pdf_path=pdf_path, progress_callback=progress_callback, strategy=strategy, nb_workers=nb_workers)
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    sizes = [len(doc.page_content) for chunk in chunker.formated_chunks for doc in chunk if doc.metadata.get("type") != "image"]
+    return {stage: summarize(latencies, sizes, 0, peak_memory) for stage, latencies in stage_latencies.items()}
+
+
+def compare_with_baseline(results, baseline_path, tolerance):
+    """
+    Compare the p50 latencies with a baseline results file.
+
+    Returns:
+        list: Descriptions of the regressions (p50 latency above the baseline by more than tolerance).
+    """
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+
+    regressions = []
+    for name, res in results.items():
+        if name not in baseline: continue
+        ratio = res["p50_s"] / max(baseline[name]["p50_s"], 1e-9)
+        if ratio > 1 + tolerance:
+            regressions.append(f"{name}: p50 {baseline[name]['p50_s']:.3f}s -> {res['p50_s']:.3f}s (x{ratio:.2f})")
+    return regressions
+
+
+def print_result(name, res):
+    throughput = f"{res['chars_per_s'] / 1000:.1f}" if res["chars_per_s"] else "-"
+    print(f"{name:<44}{res['p50_s']:>9.3f}{res['p95_s']:>9.3f}{throughput:>10}{res['peak_mb']:>9.1f}"
+          f"{res['nb_chunks']:>8}{res['size_p50']:>8.0f}{res['size_p95']:>8.0f}{res['size_max']:>8}")
+
+
+def main(args):
+    EMBEDDING_BACKENDS["fake"] = lambda model: FakeEmbeddings(size=args.dim)
+
+    methods = args.methods or list(TEXT_METHODS)
+    results = {}
+
+    print(f"Embedding backend: {args.backend}")
+    print(f"{'benchmark':<44}{'p50 s':>9}{'p95 s':>9}{'kchar/s':>10}{'peak MB':>9}{'chunks':>8}{'size50':>8}{'size95':>8}{'max':>8}")
+
+    for corpus, text in load_corpora(args).items():
+        for name in methods:
+            method, kwargs = TEXT_METHODS[name]
+            res = benchmark_text_method(text, method, kwargs, args.backend, args.repeat)
+            results[f"{corpus}/{name}"] = res
+            print_result(f"{corpus}/{name}", res)
+
+    if args.pdf:
+        for stage, res in benchmark_pdf(args.pdf, args.strategy, args.workers).items():
+            results[f"pdf/{stage}"] = res
+            print_result(f"pdf/{stage}", res)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results saved to {args.output}")
+
+    if args.baseline:
+        regressions = compare_with_baseline(results, args.baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the chunking methods of TextChunker and the stages of PDFChunker')
+
+    parser.add_argument('--methods', type=str, nargs='*', choices=list(TEXT_METHODS), default=None, help='TextChunker methods to benchmark (default: all)')
+    parser.add_argument('--backend', type=str, default='fake', help='Embedding backend ("fake" for the deterministic fake encoder)')
+    parser.add_argument('--dim', type=int, default=256, help='Size of the fake embeddings')
+    parser.add_argument('--synthetic-chars', type=int, default=100000, help='Size of the synthetic corpus (characters)')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the synthetic corpus')
+    parser.add_argument('--chunks', type=str, default='user_study/chunks.json', help='JSON chunks file whose text chunks form the bundled corpus')
+    parser.add_argument('--text', type=str, nargs='*', default=None, help='Additional text files to use as corpora')
+    parser.add_argument('--pdf', type=str, default=None, help='PDF file on which the PDFChunker stages are benchmarked')
+    parser.add_argument('--strategy', type=str, default='auto', help='Partition strategy of the PDFChunker')
+    parser.add_argument('--workers', type=int, default=1, help='Number of partition workers of the PDFChunker')
+    parser.add_argument('--repeat', type=int, default=5, help='Number of timed runs of each text benchmark')
+    parser.add_argument('--output', type=str, default=None, help='JSON file where the results are saved')
+    parser.add_argument('--baseline', type=str, default=None, help='JSON results file to compare with (exit code 1 on regression)')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed relative p50 latency increase over the baseline')
+
+    args = parser.parse_args()
+
+    main(args)
@@ -0,0 +1,122 @@
+import os
+import sys
+import json
+import argparse
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from scripts.encoders import get_embedding_model
+from scripts.grader import get_similarities, classify_similarity, get_thresholds_key, GRADER_THRESHOLDS_PATH, GRADER_EMBEDDING_BACKEND, GRADER_EMBEDDING_MODEL
+
+#####################################################################
+# Calibration of the similarity thresholds of the AnswerGrader on   #
+# labelled short answers, for one embedding backend and model. The  #
+# thresholds are the loosest ones whose verdicts keep the target    #
+# precision on the labels, and are saved by backend and model (the  #
+# similarity check stays disabled for the uncalibrated ones).       #
+#####################################################################
+
+
+def load_labels(path):
+    """Load the labelled answers (JSON lines with question, correct_answer, incorrect_answer, answer and is_correct)."""
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def find_threshold(samples, accept, precision, min_support, margin):
+    """
+    Find the loosest threshold whose verdicts (and the verdicts of all the stricter thresholds) reach a precision.
+
+    Args:
+        samples (list): List of tuples (similarity to the correct answer, similarity to the incorrect answer, is_correct).
+        accept (bool): True for the accept threshold, False for the reject threshold.
+        precision (float): Minimum share of correct verdicts.
+        min_support (int): Minimum number of verdicts of the threshold.
+        margin (float): Margin of the accept threshold over the similarity to the incorrect answer.
+
+    Returns:
+        float: The threshold, or None if no threshold reaches the precision with enough verdicts.
+    """
+    threshold = None
+    for candidate in sorted({sim_correct for sim_correct, _, _ in samples}, reverse=accept):
+        if accept:
+            verdicts = [is_correct for sim_correct, sim_incorrect, is_correct in samples if sim_correct >= candidate and sim_correct - sim_incorrect >= margin]
+        else:
+            verdicts = [not is_correct for sim_correct, _, is_correct in samples if sim_correct <= candidate]
+        if not verdicts: continue
+        if sum(verdicts) / len(verdicts) < precision:
+            break
+        if len(verdicts) >= min_support:
+            threshold = candidate
+    return threshold
+
+
+def evaluate(samples, thresholds):
+    """
+    Evaluate thresholds on the labelled answers.
+
+    Returns:
+        dict: Share of answers graded without the LLM judge, and precision of the accept and reject verdicts.
+    """
+    accepted, rejected = [], []
+    for sim_correct, sim_incorrect, is_correct in samples:
+        verdict = classify_similarity(sim_correct, sim_incorrect, thresholds)
+        if verdict is True:
+            accepted.append(is_correct)
+        elif verdict is False:
+            rejected.append(not is_correct)
+    return {
+        "coverage": (len(accepted) + len(rejected)) / len(samples),
+        "accept_precision": sum(accepted) / len(accepted) if accepted else None,
+        "reject_precision": sum(rejected) / len(rejected) if rejected else None,
+    }
+
+
+def main(args):
+    labels = load_labels(args.labels)
+    embeddings = get_embedding_model(args.model, cached=True, backend=args.backend)
+    key = get_thresholds_key(args.backend, args.model)
+
+    samples = []
+    for label in labels:
+        sim_correct, sim_incorrect = get_similarities(embeddings, label["answer"], label)
+        samples.append((sim_correct, sim_incorrect, label["is_correct"]))
+
+    thresholds = {"accept": find_threshold(samples, True, args.precision, args.min_support, args.margin), "reject": None, "margin": args.margin}
+    # The reject threshold is calibrated on the answers which are not accepted (the accept verdict is checked first)
+    remaining = [sample for sample in samples if classify_similarity(sample[0], sample[1], thresholds) is None]
+    thresholds["reject"] = find_threshold(remaining, False, args.precision, args.min_support, args.margin)
+    results = evaluate(samples, thresholds)
+
+    print(f"{key}: {len(labels)} labelled answers")
+    print(f"Thresholds: accept {thresholds['accept']}, reject {thresholds['reject']}, margin {thresholds['margin']}")
+    print(f"Graded without the LLM judge: {results['coverage']:.0%} "
+          f"(accept precision: {results['accept_precision']}, reject precision: {results['reject_precision']})")
+
+    if args.save:
+        calibrated = {}
+        if os.path.exists(args.output):
+            with open(args.output, "r", encoding="utf-8") as f:
+                calibrated = json.load(f)
+        calibrated[key] = {**thresholds, "nb_labels": len(labels), **results}
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(calibrated, f, indent=2)
+        print(f"Thresholds saved to {args.output}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Calibrate the similarity thresholds of the short answer grader on labelled answers')
+
+    parser.add_argument('--labels', type=str, default='benchmarks/grader_labels.jsonl', help='Labelled answers (JSON lines)')
+    parser.add_argument('--backend', type=str, default=GRADER_EMBEDDING_BACKEND, help='Embedding backend (default: GRADER_EMBEDDING_BACKEND or EMBEDDING_BACKEND)')
+    parser.add_argument('--model', type=str, default=GRADER_EMBEDDING_MODEL, help='Embedding model (ignored by the local backends)')
+    parser.add_argument('--precision', type=float, default=1.0, help='Minimum precision of the accept and reject verdicts on the labels')
+    parser.add_argument('--min-support', type=int, default=3, help='Minimum number of verdicts for a threshold to be kept')
+    parser.add_argument('--margin', type=float, default=0.1, help='Margin of the accept threshold over the similarity to the incorrect answer')
+    parser.add_argument('--save', action='store_true', help='Save the thresholds, enabling the similarity check for this backend and model')
+    parser.add_argument('--output', type=str, default=GRADER_THRESHOLDS_PATH, help='Thresholds file')
+
+    args = parser.parse_args()
+
+    main(args)
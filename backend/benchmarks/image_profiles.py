@@ -0,0 +1,119 @@
+import os
+import sys
+import io
+import json
+import time
+import math
+import base64
+import argparse
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from PIL import Image as PILImage
+from utils.helpers import IMAGE_PROFILES, encode_image, convert_pdf_to_images
+
+#################################################################
+# Benchmark of the image encoding profiles (see IMAGE_PROFILES) #
+# Reports the encoded size, the encode time and an estimate of  #
+# the vision tokens of the images for each profile.             #
+#################################################################
+
+PDF_DPI = 200 # Resolution of the chunk images stored in the chunks files
+
+
+def estimate_vision_tokens(width, height):
+    """
+    Estimate the number of vision tokens of an image sent with high detail to GPT-4o.
+    The image is scaled to fit in 2048x2048, then its shortest side is scaled to 768 and it is split in 512x512 tiles.
+
+    Args:
+        width (int): Width of the image.
+        height (int): Height of the image.
+
+    Returns:
+        int: Estimated number of tokens.
+    """
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    return 85 + 170 * math.ceil(width / 512) * math.ceil(height / 512)
+
+
+def load_chunk_images(path):
+    """Load the chunk images of a JSON chunks file as PIL images."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return [PILImage.open(io.BytesIO(base64.b64decode(entry["chunk_img_b64"]))) for entry in data]
+
+
+def benchmark_profile(images, profile, scale=1.0, repeat=3):
+    """
+    Encode images with a profile.
+
+    Args:
+        images (list): List of PIL images.
+        profile (dict): Encoding profile.
+        scale (float): Scale applied to the images before encoding to simulate the render dpi of the profile.
+        repeat (int): Number of times each image is encoded (the best time is kept).
+
+    Returns:
+        dict: Total bytes, mean encode time (ms) and mean vision tokens per image.
+    """
+    total_bytes, total_time, total_tokens = 0, 0.0, 0
+    for img in images:
+        if scale != 1.0:
+            img = img.resize((max(1, int(img.width * scale)), max(1, int(img.height * scale))), PILImage.LANCZOS)
+
+        best_time = float("inf")
+        for _ in range(repeat):
+            start_time = time.perf_counter()
+            encoded = encode_image(img, profile)
+            best_time = min(best_time, time.perf_counter() - start_time)
+
+        encoded_img = PILImage.open(io.BytesIO(encoded))
+        total_bytes += len(encoded)
+        total_time += best_time
+        total_tokens += estimate_vision_tokens(encoded_img.width, encoded_img.height)
+
+    return {
+        "total_bytes": total_bytes,
+        "mean_encode_ms": 1000 * total_time / len(images),
+        "mean_vision_tokens": total_tokens / len(images),
+    }
+
+
+def main(args):
+    if args.pdf:
+        source = args.pdf
+    else:
+        source = args.chunks
+        images = load_chunk_images(args.chunks)
+
+    print(f"Source: {source}")
+    print(f"{'profile':<10}{'format':<8}{'dpi':>5}{'images':>8}{'total KB':>12}{'KB/img':>10}{'encode ms':>11}{'tokens':>9}")
+
+    for name, profile in IMAGE_PROFILES.items():
+        if args.pdf:
+            # Render the pages at the dpi of the profile
+            images = convert_pdf_to_images(pdf_path=args.pdf, dpi=profile["dpi"])
+            scale = 1.0
+        else:
+            scale = profile["dpi"] / PDF_DPI
+
+        res = benchmark_profile(images, profile, scale=scale, repeat=args.repeat)
+        print(f"{name:<10}{profile['format']:<8}{profile['dpi']:>5}{len(images):>8}"
+              f"{res['total_bytes'] / 1024:>12.1f}{res['total_bytes'] / 1024 / len(images):>10.1f}"
+              f"{res['mean_encode_ms']:>11.1f}{res['mean_vision_tokens']:>9.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the image encoding profiles')
+
+    parser.add_argument('--chunks', type=str, default='user_study/chunks.json', help='JSON chunks file whose chunk images are encoded')
+    parser.add_argument('--pdf', type=str, default=None, help='PDF file whose pages are rendered and encoded (instead of the chunk images)')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of times each image is encoded')
+
+    args = parser.parse_args()
+
+    main(args)
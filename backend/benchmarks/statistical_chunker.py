@@ -0,0 +1,83 @@
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+from scripts.chunk import TextChunker
+
+#####################################################################
+# Benchmark of the vectorized statistical chunker against the       #
+# semantic_chunkers StatisticalChunker on long texts. Both use the  #
+# same embedding backend (local by default, so no network calls).   #
+#####################################################################
+
+
+def load_text(args):
+    """Load the benchmark text: a text file, or the text chunks of a JSON chunks file concatenated."""
+    if args.text:
+        with open(args.text, "r", encoding="utf-8") as f:
+            text = f.read()
+    else:
+        with open(args.chunks, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        text = "\n\n".join(
+            doc["page_content"] for entry in data for doc in entry["formated_chunk"] if doc["metadata"].get("type") != "image"
+        )
+    return "\n\n".join([text] * args.multiply)
+
+
+def benchmark_method(chunker, method, repeat=3):
+    """
+    Run a chunking method of a TextChunker.
+
+    Args:
+        chunker (TextChunker): The chunker.
+        method (str): Name of the chunking method.
+        repeat (int): Number of runs (the best time is kept).
+
+    Returns:
+        dict: Best time (s), number of chunks and mean/max chunk length (characters).
+    """
+    best_time = float("inf")
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        chunks = getattr(chunker, method)()
+        best_time = min(best_time, time.perf_counter() - start_time)
+
+    lengths = np.array([len(chunk) for chunk in chunks])
+    return {
+        "time": best_time,
+        "nb_chunks": len(chunks),
+        "mean_chars": lengths.mean() if len(lengths) else 0,
+        "max_chars": lengths.max() if len(lengths) else 0,
+    }
+
+
+def main(args):
+    text = load_text(args)
+    chunker = TextChunker(text, output_document=False, embedding_backend=args.backend)
+
+    print(f"Text: {len(text)} characters, backend: {args.backend}")
+    print(f"{'method':<32}{'time s':>9}{'chunks':>8}{'mean chars':>12}{'max chars':>11}")
+
+    for method in ["statistical_chunk", "vectorized_statistical_chunk"]:
+        res = benchmark_method(chunker, method, repeat=args.repeat)
+        print(f"{method:<32}{res['time']:>9.2f}{res['nb_chunks']:>8}{res['mean_chars']:>12.0f}{res['max_chars']:>11}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the statistical chunkers on long texts')
+
+    parser.add_argument('--text', type=str, default=None, help='Text file to chunk (instead of the text of the chunks file)')
+    parser.add_argument('--chunks', type=str, default='user_study/chunks.json', help='JSON chunks file whose text chunks are concatenated')
+    parser.add_argument('--multiply', type=int, default=10, help='Number of times the text is repeated to make it longer')
+    parser.add_argument('--backend', type=str, default='hashing', help='Embedding backend (see EMBEDDING_BACKENDS)')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of runs of each method')
+
+    args = parser.parse_args()
+
+    main(args)
@@ -1,23 +1,34 @@
-from fastapi import FastAPI, UploadFile, File, Body
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, UploadFile, File, Body, Request, BackgroundTasks
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi import status
 from fastapi.middleware.cors import CORSMiddleware
 import uuid
 import os
+import json
 import sys
+import hashlib
+import tempfile
+import threading
+import time
 
 sys.path.append(os.path.abspath(os.path.join(os.getcwd(), '..')))
 
 from typing import Optional
 from pydantic import BaseModel
-from io import BytesIO
-from scripts.bloom_gen import BloomQuestionGenerator
-from scripts.chunk import TextChunker, PDFChunker
+from scripts.bloom_gen import BloomQuestionGenerator, GenerationError
+from scripts.chunk import TextChunker, StreamingTextChunker, PDFChunker, CHUNKING_PARAMS
+from scripts.chunk_store import CHUNK_STORE_VERSION, ChunkStoreClosedError
 from scripts.learner import LearningTracker
+from scripts.ingest import IngestionQueue, QueueFullError
+from scripts.cache import ChunkCache, QuestionCache, AnswerCache
+from scripts.grader import AnswerGrader
+from scripts.question_bank import QuestionBank
+from scripts.prefetch import QuestionPrefetcher, PREFETCH_ENABLED
 from scripts.neo4j_rag import KnowledgeGraphRAG
-from utils.helpers import connection
+from utils.helpers import connection, get_image_profile, get_image_mime_type
 from dotenv import load_dotenv
 from supabase import create_client
+from starlette.concurrency import run_in_threadpool
 
 load_dotenv()
 SUPABASE_URL = os.getenv("SUPABASE_URL")
@@ -39,6 +50,19 @@ class FeedbackRequest(BaseModel):
 app = FastAPI()
 
 CORS_ORIGIN = os.getenv("CORS_ORIGIN", "http://localhost:5173")
+PARTITION_WORKERS = int(os.getenv("PARTITION_WORKERS", 1)) # Number of processes used to partition a PDF
+PARTITION_STRATEGY = os.getenv("PARTITION_STRATEGY", "auto") # "auto" to use hi_res only on the pages which need it, or "hi_res"
+DISPLAY_IMAGE_PROFILE = os.getenv("DISPLAY_IMAGE_PROFILE", "display") # Encoding of the chunk images (see IMAGE_PROFILES)
+LLM_IMAGE_PROFILE = os.getenv("LLM_IMAGE_PROFILE", "llm") # Encoding of the images sent to the LLM
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", tempfile.gettempdir()) # Directory where the uploaded files are spooled while processed
+UPLOAD_READ_SIZE = 1024 * 1024 # Size of the blocks in which the uploaded files are streamed to disk
+CHUNK_WAIT_TIMEOUT = float(os.getenv("CHUNK_WAIT_TIMEOUT", 10)) # Seconds /chunk waits for a chunk still being processed
+SESSION_TTL = float(os.getenv("SESSION_TTL", 24 * 3600)) # Seconds of inactivity after which a session is closed
+# Chunk images never change for a given session and step, so they can be cached for a long time
+CHUNK_IMAGE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+QUESTION_CANDIDATES = int(os.getenv("QUESTION_CANDIDATES", 1)) # Candidate questions generated per LLM call (best of N if > 1)
+QUESTION_BANK_PATH = os.getenv("QUESTION_BANK_PATH") # Pre-generated questions (see scripts/question_bank.py)
+MAX_FAILED_ATTEMPTS = 2 # Number of incorrect answers after which the learner moves to the next chunk
 
 # Allow frontend access
 app.add_middleware(
@@ -52,14 +76,98 @@ SESSIONS = {}
 
 NEO4J_CREDENTIALS = {}
 
-question_generator = BloomQuestionGenerator()
-
-@app.post("/upload")
-async def upload_and_process(file: UploadFile = File(...)):
-    session_id = str(uuid.uuid4())
-    contents = await file.read()
-    filename = file.filename
-
+# Generated questions are shared across sessions, so that common course material is not regenerated for each learner
+# Questions of fixed course material can also be pre-generated in a question bank
+question_bank = QuestionBank(QUESTION_BANK_PATH) if QUESTION_BANK_PATH else None
+# Short answers are graded against the reference answers of the question when the verdict is clear, the LLM judge
+# is only called for the ambiguous ones
+question_generator = BloomQuestionGenerator(question_cache=QuestionCache(), 
+                                            question_bank=question_bank, 
+                                            answer_grader=AnswerGrader(AnswerCache()))
+
+async def generate_question(docs, question_type, level, topic=None, different_from=None):
+    """Generate the question of a step of a session."""
+    return await question_generator.agenerate_question(docs, 
+                                                       question_type, 
+                                                       level=level, 
+                                                       prompt_type="desc", 
+                                                       topic=topic,
+                                                       different_from=different_from,
+                                                       refine=True,
+                                                       nb_candidates=QUESTION_CANDIDATES)
+
+def stream_question(docs, question_type, level, topic=None, different_from=None):
+    """Stream the generation of the question of a step of a session (a single candidate, see astream_question)."""
+    return question_generator.astream_question(docs, 
+                                               question_type, 
+                                               level=level, 
+                                               prompt_type="desc", 
+                                               topic=topic,
+                                               different_from=different_from,
+                                               refine=True)
+
+# The likely next questions are generated while the learner answers the current one
+prefetcher = QuestionPrefetcher(generate_question)
+
+# Uploaded files are processed in the background so that large PDFs do not hold the request open
+ingestion_queue = IngestionQueue()
+
+# Processed PDFs are cached on disk so that re-uploading the same file skips the chunking
+chunk_cache = ChunkCache()
+CHUNK_CACHE_PARAMS = {
+    **CHUNKING_PARAMS, 
+    "strategy": PARTITION_STRATEGY,
+    "image_profile": get_image_profile(DISPLAY_IMAGE_PROFILE), 
+    "llm_image_profile": get_image_profile(LLM_IMAGE_PROFILE),
+    "chunk_store": CHUNK_STORE_VERSION,
+}
+
+async def spool_upload(file):
+    """
+    Stream an uploaded file to a temporary file on disk, hashing it on the way.
+
+    Args:
+        file (UploadFile): The uploaded file.
+
+    Returns:
+        tuple: (path, file_hash) with the path of the temporary file and the SHA-256 hex digest of its content.
+    """
+    file_hash = hashlib.sha256()
+    fd, path = tempfile.mkstemp(suffix=os.path.splitext(file.filename)[1], dir=UPLOAD_DIR)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            while block := await file.read(UPLOAD_READ_SIZE):
+                file_hash.update(block)
+                await run_in_threadpool(f.write, block)
+    except BaseException:
+        # Also on cancellation (e.g. the client disconnected), the partial file is never processed
+        os.remove(path)
+        raise
+    return path, file_hash.hexdigest()
+
+def process_upload(session_id, path, filename, progress_callback=None, cache_key=None):
+    """
+    Process a spooled upload (see chunk_upload) and delete the file once it is done.
+    """
+    try:
+        return chunk_upload(session_id, path, filename, progress_callback=progress_callback, cache_key=cache_key)
+    finally:
+        os.remove(path)
+
+def chunk_upload(session_id, path, filename, progress_callback=None, cache_key=None):
+    """
+    Chunk an uploaded file and create its session once the processing is done.
+
+    Args:
+        session_id (str): The id of the session to create.
+        path (str): Path of the uploaded file spooled on disk.
+        filename (str): Name of the uploaded file.
+        progress_callback (callable): Called with (stage, done, total) while processing the file.
+        cache_key (str): Key of the file in the chunk cache. If it is a hit, the cached chunks are reused.
+
+    Returns:
+        str: The id of the created session.
+    """
     tracker = LearningTracker(
         session_id,
         strategy="default",
@@ -70,100 +178,473 @@ async def upload_and_process(file: UploadFile = File(...)):
 
     session_data = {
         "tracker": tracker,
-        "file_bytes": contents,
         "filename": filename,
         "topic": None, 
         "chunks": None,
         "chunks_img": None,
+        "total_chunks": None,
+        "chunk_ready": threading.Condition(), # Notified each time a chunk has been processed
+        "ingest_error": None,
         "questions": [],
+        "reference_answers": [], # Correct and incorrect answers generated with the SAQ (None for MCQ)
         "answers": [],
         "bloom_levels": [],
         "question_types": [],
         "current_step": 0,
         "failed_attempts": {},  # Track failed attempts for each chunk
+        "chunk_store": None, # Memory-mapped chunk store of the cached chunks, unmapped when the session is closed
+        "cache_key": cache_key, # Identifies the chunk images of the file, used for their ETags
+        "image_etags": {}, # ETag of each chunk image, computed once
+        "last_active": time.time(),
     }
 
     if filename.endswith(".pdf"):
-        file_obj = BytesIO(contents)
-        chunker = PDFChunker(file_obj=file_obj)
+        cache_path = chunk_cache.get(cache_key) if cache_key else None
+        if cache_path is not None:
+            chunker = PDFChunker(load_path=cache_path)
+            session_data["chunks"] = chunker.formated_chunks
+            session_data["chunks_img"] = chunker.chunks_img_bytes
+            session_data["total_chunks"] = len(chunker.formated_chunks)
+            session_data["chunk_store"] = chunker.chunk_store
+            SESSIONS[session_id] = session_data
+            return session_id
+
+        chunker = PDFChunker(pdf_path=path, 
+                             progress_callback=progress_callback, 
+                             nb_workers=PARTITION_WORKERS, 
+                             stream=True,
+                             strategy=PARTITION_STRATEGY,
+                             image_profile=DISPLAY_IMAGE_PROFILE,
+                             llm_image_profile=LLM_IMAGE_PROFILE)
+        # The lists are filled by the chunker while the chunks are processed (chunk images as encoded bytes)
         session_data["chunks"] = chunker.formated_chunks
-        session_data["chunks_img"] = chunker.chunks_img_b64
+        session_data["chunks_img"] = chunker.chunks_img_bytes
+        session_data["total_chunks"] = len(chunker.chunks)
+
+        # The session becomes usable as soon as the PDF is partitioned, each chunk is served once it is processed
+        SESSIONS[session_id] = session_data
+        try:
+            for _ in chunker.stream_chunks():
+                with session_data["chunk_ready"]:
+                    session_data["chunk_ready"].notify_all()
+        except Exception as e:
+            with session_data["chunk_ready"]:
+                session_data["ingest_error"] = str(e)
+                session_data["chunk_ready"].notify_all()
+            raise
+
+        if cache_key:
+            chunk_cache.put(cache_key, chunker)
     elif filename.endswith(".txt"):
-        text = contents.decode("utf-8")
-        chunker = TextChunker(text)
-        # session_data["chunks"] = chunker.recursive_chunk(chunk_size=1000)
-        session_data["chunks"] = chunker.statistical_chunk()
+        # The text is decoded and chunked by windows of paragraphs instead of being loaded whole
+        chunker = StreamingTextChunker(path, method="statistical_chunk", progress_callback=progress_callback)
+        session_data["chunks"] = list(chunker.stream_chunks())
+        session_data["total_chunks"] = len(session_data["chunks"])
         session_data["chunks_img"] = None
+        SESSIONS[session_id] = session_data
     else:
         raise ValueError("Unsupported file type")
 
-    SESSIONS[session_id] = session_data
+    return session_id
+
+def close_session(session_id):
+    """Remove a session, cancel its prefetches and unmap its chunk store."""
+    session = SESSIONS.pop(session_id, None)
+    if session is None:
+        return
+    prefetcher.cancel(session_id)
+    if session.get("chunk_store") is not None:
+        session["chunk_store"].close()
+
+def evict_sessions(ttl=SESSION_TTL):
+    """Close the sessions which have been inactive for more than ttl seconds."""
+    now = time.time()
+    for session_id, session in list(SESSIONS.items()):
+        if now - session.get("last_active", now) > ttl:
+            close_session(session_id)
+
+@app.exception_handler(ChunkStoreClosedError)
+def chunk_store_closed(request: Request, exc: ChunkStoreClosedError):
+    """The session was closed (see evict_sessions) while a request was reading its chunks."""
+    return JSONResponse(
+        status_code=status.HTTP_410_GONE,
+        content={"status": "error", "message": "Session expired"}
+    )
 
-    return {"session_id": session_id, "status": "processed"}
+def is_chunk_ready(session, step):
+    """Check if the chunk of a step has been processed (text and image)."""
+    if session["chunks"] is None or step >= len(session["chunks"]):
+        return False
+    return session["chunks_img"] is None or step < len(session["chunks_img"])
 
-@app.get("/chunk/{session_id}")
-def get_chunk(session_id: str):
-    session = SESSIONS.get(session_id)
-    step = session["current_step"]
-    total_chunks = len(session["chunks"])
-    chunk = session["chunks"][step]
+def wait_for_chunk(session, step, timeout=CHUNK_WAIT_TIMEOUT):
+    """
+    Wait until the chunk of a step has been processed.
+
+    Args:
+        session (dict): The session data.
+        step (int): The step of the chunk.
+        timeout (float): Maximum number of seconds to wait.
+
+    Returns:
+        bool: True if the chunk is ready, False if the timeout expired or the processing failed.
+    """
+    condition = session.get("chunk_ready")
+    if condition is None:
+        return is_chunk_ready(session, step)
+
+    with condition:
+        condition.wait_for(lambda: is_chunk_ready(session, step) or session["ingest_error"] is not None, timeout=timeout)
+    return is_chunk_ready(session, step)
 
+@app.post("/upload")
+async def upload_and_process(file: UploadFile = File(...)):
+    evict_sessions()
+    session_id = str(uuid.uuid4())
+    filename = file.filename
+
+    if not filename.endswith((".pdf", ".txt")):
+        return JSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={"status": "error", "message": "Unsupported file type"}
+        )
+
+    # The file is streamed to disk and processed from there, its bytes are never kept in memory
+    path, file_hash = await spool_upload(file)
+
+    cache_key = None
+    if filename.endswith(".pdf"):
+        cache_key = chunk_cache.get_key(file_hash, CHUNK_CACHE_PARAMS)
+        if chunk_cache.get(cache_key) is not None:
+            # Cache hit, the session can be created right away without going through the queue
+            await run_in_threadpool(process_upload, session_id, path, filename, cache_key=cache_key)
+            return {"job_id": None, "session_id": session_id, "status": "done", "ready": True}
+
+    try:
+        job_id = ingestion_queue.submit(process_upload, 
+                                        session_id, 
+                                        path, 
+                                        filename, 
+                                        cache_key=cache_key, 
+                                        info={"session_id": session_id})
+    except QueueFullError as e:
+        os.remove(path)
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"status": "error", "message": str(e)}
+        )
+
+    return {"job_id": job_id, "session_id": session_id, "status": "queued", "ready": False}
+
+@app.get("/upload/{job_id}")
+def get_upload_status(job_id: str):
+    ingestion_queue.cleanup()
+    job = ingestion_queue.get_status(job_id)
+    if job is None:
+        return JSONResponse(
+            status_code=status.HTTP_404_NOT_FOUND,
+            content={"status": "error", "message": "Upload job not found"}
+        )
+
+    session_id = job["info"]["session_id"]
+
+    return {"job_id": job_id, 
+            "session_id": session_id, 
+            "status": job["status"], 
+            "ready": session_id in SESSIONS and job["status"] != "failed", # Whether the first chunks can be served
+            "stages": job["stages"], 
+            "error": job["error"]}
+
+def get_prefetch_candidates(session, step, bloom_level):
+    """
+    Get the questions the session may ask at the next call of /chunk, after a correct or an incorrect answer
+    to the current question.
+
+    Args:
+        session (dict): The session data.
+        step (int): The current step.
+        bloom_level (int): Bloom level of the current question.
+
+    Returns:
+        list: List of tuples (key, kwargs) to pass to QuestionPrefetcher.prefetch.
+    """
     tracker = session["tracker"]
-    question_type = tracker.get_question_type()
-    bloom_level = tracker.get_next_bloom_level()
+    candidates = []
+    for is_correct in (True, False):
+        level = tracker.predict_next_bloom_level(is_correct, bloom_level)
+        if level is None: continue
+
+        # Same progression logic as submit_answer
+        is_retry = not is_correct and session["failed_attempts"].get(step, 0) + 1 < MAX_FAILED_ATTEMPTS
+        next_step = step if is_retry else step + 1
+        if next_step >= session["total_chunks"] or not is_chunk_ready(session, next_step): continue
+
+        candidates.append(((next_step, level, is_retry), {
+            "docs": session["chunks"][next_step],
+            "question_type": tracker.get_question_type(),
+            "level": level,
+            "topic": session["topic"],
+            "different_from": session["questions"][-1] if is_retry else None,
+        }))
+    return candidates
+
+async def get_ready_session(session_id):
+    """
+    Get a session whose current chunk has been processed.
+
+    Returns:
+        tuple: (session, None), or (None, error response) if the session or its current chunk is not available.
+    """
+    session = SESSIONS.get(session_id)
+    if session is None:
+        return None, JSONResponse(
+            status_code=status.HTTP_404_NOT_FOUND,
+            content={"status": "error", "message": "Session not found or not ready yet"}
+        )
+    session["last_active"] = time.time()
+
+    if not await run_in_threadpool(wait_for_chunk, session, session["current_step"]):
+        if session.get("ingest_error"):
+            return None, JSONResponse(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                content={"status": "error", "message": f"Failed to process the file: {session['ingest_error']}"}
+            )
+        return None, JSONResponse(
+            status_code=status.HTTP_202_ACCEPTED,
+            content={"status": "processing", "message": "Chunk not ready yet"}
+        )
 
-    is_retry = session["failed_attempts"].get(step, 0) > 0
+    return session, None
 
-    if is_retry:
-        last_question = session["questions"][-1]
-    else:
-        last_question = None
-    
-    print(session["topic"])
-    response = question_generator.generate_question(chunk, 
-                                                    question_type, 
-                                                    level=bloom_level, 
-                                                    prompt_type="desc", 
-                                                    topic=session["topic"],
-                                                    different_from=last_question,
-                                                    refine=True)
+def get_chunk_content(session_id, session, step):
+    """
+    Get the content of the chunk of a step, as returned to the client.
+
+    Returns:
+        tuple: (chunk, is_img) where chunk is the text of the chunk or the URL of its image.
+    """
+    if session["chunks_img"] is not None:
+        # The image itself is served (and cached by the browser) by the chunk image endpoint
+        return f"/chunk/{session_id}/{step}/image", True
+    return session["chunks"][step][0].page_content, False
+
+def get_progress(session, step):
+    """Get the progress of a session at a step."""
+    return {
+        "current": step ,
+        "total": session["total_chunks"],
+        "percent": int(((step) / session["total_chunks"]) * 100)
+    }
+
+def record_question(session, bloom_level, question_type, response):
+    """
+    Record the question asked at the current step of a session.
 
+    Returns:
+        The question as returned to the client (dict for MCQ, str for SAQ).
+    """
     if question_type == "SAQ":
         question = response["question"]
+        reference = {"correct_answer": response["correct_answer"], "incorrect_answer": response["incorrect_answer"]}
     elif question_type == "MCQ":
         question = response
+        reference = None
 
     session["bloom_levels"].append(bloom_level)
     session["questions"].append(question)
+    session["reference_answers"].append(reference)
     session["question_types"].append(question_type)  
+    return question
 
-    if session["chunks_img"] is not None:
-        chunk = session["chunks_img"][step]
-        is_img = True
+@app.get("/chunk/{session_id}")
+async def get_chunk(session_id: str, background_tasks: BackgroundTasks):
+    session, error = await get_ready_session(session_id)
+    if error is not None:
+        return error
+    step = session["current_step"]
+
+    chunk = session["chunks"][step]
+
+    tracker = session["tracker"]
+    previous_level = tracker.current_level
+    bloom_level = tracker.get_next_bloom_level()
+
+    is_retry = session["failed_attempts"].get(step, 0) > 0
+
+    if is_retry:
+        last_question = session["questions"][-1]
     else:
-        chunk = chunk[0].page_content
-        is_img = False
+        last_question = None
+    
+    print(session["topic"])
+    response = None
+    prefetched = prefetcher.take(session_id, (step, bloom_level, is_retry))
+    if prefetched is not None:
+        question_type, task = prefetched
+        try:
+            response = await task
+        except Exception as e:
+            print(f"Prefetched question failed: {e}")
+
+    if response is None:
+        question_type = tracker.get_question_type()
+        try:
+            response = await generate_question(chunk, 
+                                               question_type, 
+                                               level=bloom_level, 
+                                               topic=session["topic"],
+                                               different_from=last_question)
+        except GenerationError as e:
+            tracker.current_level = previous_level # The level is chosen again when the client retries
+            return JSONResponse(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                content={"status": "error", "message": f"Failed to generate the question: {e}"}
+            )
+
+    question = record_question(session, bloom_level, question_type, response)
+
+    if PREFETCH_ENABLED:
+        background_tasks.add_task(prefetcher.prefetch, session_id, get_prefetch_candidates(session, step, bloom_level))
+
+    chunk, is_img = get_chunk_content(session_id, session, step)
 
     return {"chunk": chunk if not is_retry else None,
             "question": question, 
             "question_type": question_type,
             "bloom_level": BLOOM_MAP_REVERSE[bloom_level],
             "is_img": is_img,
-            "progress": {
-                "current": step ,
-                "total": total_chunks,
-                "percent": int(((step) / total_chunks) * 100)
-            },
+            "progress": get_progress(session, step),
             "is_retry": is_retry
         }
 
+def format_sse(event, data):
+    """Format a server-sent event with JSON data."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.get("/chunk/{session_id}/stream")
+async def stream_chunk(session_id: str, background_tasks: BackgroundTasks):
+    """
+    Streaming variant of /chunk (server-sent events). The chunk is sent right away, then the question as it is generated:
+        - "chunk": chunk, is_img, is_retry, progress, bloom_level and question_type,
+        - "question_delta": stem of the question received so far (not sent for cached or prefetched questions),
+        - "question": the final question and its type, as returned by /chunk,
+        - "error": the question could not be generated (the client can ask again).
+    """
+    session, error = await get_ready_session(session_id)
+    if error is not None:
+        return error
+    step = session["current_step"]
+
+    tracker = session["tracker"]
+    previous_level = tracker.current_level
+    bloom_level = tracker.get_next_bloom_level()
+
+    is_retry = session["failed_attempts"].get(step, 0) > 0
+    last_question = session["questions"][-1] if is_retry else None
+
+    prefetched = prefetcher.take(session_id, (step, bloom_level, is_retry))
+    question_type = prefetched[0] if prefetched is not None else tracker.get_question_type()
+    chunk, is_img = get_chunk_content(session_id, session, step)
+
+    async def events():
+        recorded = False
+        try:
+            yield format_sse("chunk", {"chunk": chunk if not is_retry else None,
+                                       "question_type": question_type,
+                                       "bloom_level": BLOOM_MAP_REVERSE[bloom_level],
+                                       "is_img": is_img,
+                                       "progress": get_progress(session, step),
+                                       "is_retry": is_retry})
+
+            response = None
+            if prefetched is not None:
+                try:
+                    response = await prefetched[1]
+                except Exception as e:
+                    print(f"Prefetched question failed: {e}")
+
+            if response is None:
+                try:
+                    async for event, data in stream_question(session["chunks"][step], 
+                                                             question_type, 
+                                                             level=bloom_level, 
+                                                             topic=session["topic"],
+                                                             different_from=last_question):
+                        if event == "stem":
+                            yield format_sse("question_delta", {"question": data})
+                        else:
+                            response = data
+                except GenerationError as e:
+                    yield format_sse("error", {"status": "error", "message": f"Failed to generate the question: {e}"})
+                    return
+                except ChunkStoreClosedError:
+                    yield format_sse("error", {"status": "error", "message": "Session expired"})
+                    return
+
+            question = record_question(session, bloom_level, question_type, response)
+            recorded = True
+
+            if PREFETCH_ENABLED:
+                # Run once the stream is over
+                background_tasks.add_task(prefetcher.prefetch, session_id, get_prefetch_candidates(session, step, bloom_level))
+
+            yield format_sse("question", {"question": question, "question_type": question_type})
+        finally:
+            if not recorded:
+                tracker.current_level = previous_level # The level is chosen again when the client asks again
+
+    # Disable the buffering of proxies so that the events are delivered as they are produced
+    return StreamingResponse(events(), 
+                             media_type="text/event-stream", 
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+def get_chunk_image_etag(session, step):
+    """
+    Get the ETag of the image of the chunk of a step, computed once per chunk. The images of a cached file are identified
+    by its cache key (hash of the file and of the processing parameters), the other ones by the hash of their bytes.
+    """
+    etags = session.setdefault("image_etags", {})
+    etag = etags.get(step)
+    if etag is None:
+        if session.get("cache_key"):
+            etag = f'"{session["cache_key"]}-{step}"'
+        else:
+            etag = f'"{hashlib.sha256(session["chunks_img"][step]).hexdigest()}"'
+        etags[step] = etag
+    return etag
+
+@app.get("/chunk/{session_id}/{step}/image")
+def get_chunk_image(session_id: str, step: int, request: Request):
+    session = SESSIONS.get(session_id)
+    if session is None or session["chunks_img"] is None or step < 0 or not is_chunk_ready(session, step):
+        return JSONResponse(
+            status_code=status.HTTP_404_NOT_FOUND,
+            content={"status": "error", "message": "Chunk image not found"}
+        )
+
+    etag = get_chunk_image_etag(session, step)
+    headers = {"ETag": etag, "Cache-Control": CHUNK_IMAGE_CACHE_CONTROL}
+
+    # Conditional request, the browser already has this image
+    if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    img = session["chunks_img"][step]
+    return Response(content=bytes(img), media_type=get_image_mime_type(img), headers=headers)
+
 @app.post("/answer/{session_id}")
-def submit_answer(session_id: str, body: AnswerRequest = Body(...)):
+async def submit_answer(session_id: str, body: AnswerRequest = Body(...)):
     answer = body.answer
     elapsed_time = body.elapsed_time
     session = SESSIONS.get(session_id)
+    if session is None:
+        return JSONResponse(
+            status_code=status.HTTP_404_NOT_FOUND,
+            content={"status": "error", "message": "Session not found or not ready yet"}
+        )
+    session["last_active"] = time.time()
     step = session["current_step"]
-    total_chunks = len(session["chunks"])
+    total_chunks = session["total_chunks"]
 
     question = session["questions"][-1]
     chunk = session["chunks"][step]
@@ -174,7 +655,13 @@ def submit_answer(session_id: str, body: AnswerRequest = Body(...)):
         is_correct = question_generator.check_answer_mcq(question, answer)
         feedback = "" if is_correct else f"Correct answer is: {question['answer']}"
     else:
-        is_correct, feedback = question_generator.check_answer_saq(chunk, question, answer)
+        try:
+            is_correct, feedback = await question_generator.acheck_answer_saq(chunk, question, answer, session["reference_answers"][-1])
+        except GenerationError as e:
+            return JSONResponse(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                content={"status": "error", "message": f"Failed to check the answer: {e}"}
+            )
 
     # Feedback message
     text_emoji = "Correct ✅." if is_correct else "Incorrect ❌."
@@ -196,14 +683,14 @@ def submit_answer(session_id: str, body: AnswerRequest = Body(...)):
         session["failed_attempts"].pop(step, None)  # Reset failed attempts
     else:
         session["failed_attempts"][step] += 1
-        if session["failed_attempts"][step] >= 2:
+        if session["failed_attempts"][step] >= MAX_FAILED_ATTEMPTS:
             session["current_step"] += 1
             session["failed_attempts"].pop(step, None)  # Reset for next chunk
 
     # Progress response
     step = session["current_step"]
     if step >= total_chunks:
-        tracker.post_logs()
+        await run_in_threadpool(tracker.post_logs)
         return {
             "feedback": feedback,
             "is_last": True,
@@ -298,6 +785,7 @@ def query_knowledge_graph(data: dict = Body(...)):
         )
 
     # Simulate uploaded text file flow
+    evict_sessions()
     session_id = str(uuid.uuid4())
     tracker = LearningTracker(
         session_id,
@@ -312,16 +800,18 @@ def query_knowledge_graph(data: dict = Body(...)):
 
     session_data = {
         "tracker": tracker,
-        "file_bytes": None,
         "filename": "neo4j_content.txt",
         "topic": None,
         "chunks": chunks,
         "chunks_img": None,
+        "total_chunks": len(chunks),
         "questions": [],
+        "reference_answers": [], # Correct and incorrect answers generated with the SAQ (None for MCQ)
         "answers": [],
         "bloom_levels": [],
         "question_types": [],
         "current_step": 0,
+        "last_active": time.time(),
     }
 
     SESSIONS[session_id] = session_data
@@ -337,6 +827,7 @@ def user_study(body: dict = Body(...)):
             status_code=status.HTTP_400_BAD_REQUEST,
             content={"status": "error", "message": "Missing prolific_id"}
         )
+    evict_sessions()
     session_id = str(uuid.uuid4())
 
     PRE_CHUNK_PATH = "./user_study/chunks.json"
@@ -354,17 +845,19 @@ def user_study(body: dict = Body(...)):
 
     session_data = {
         "tracker": tracker,
-        "file_bytes": None,
         "filename": "user_study.pdf",
         "topic": "AI Agent",
         "chunks": chunker.formated_chunks,
-        "chunks_img": chunker.chunks_img_b64,
+        "chunks_img": chunker.chunks_img_bytes,
+        "total_chunks": len(chunker.formated_chunks),
         "questions": [],
+        "reference_answers": [], # Correct and incorrect answers generated with the SAQ (None for MCQ)
         "answers": [],
         "bloom_levels": [],
         "question_types": [],
         "current_step": 0,
         "failed_attempts": {},
+        "last_active": time.time(),
     }
 
     SESSIONS[session_id] = session_data
@@ -0,0 +1,145 @@
+import os
+import requests
+
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+load_dotenv()
+
+BLOOM_BERT_MAP = {"Remember": 1, "Understand": 2, "Apply": 3, "Analyse": 4, "Analyze": 4, "Evaluate": 5, "Create": 6}
+
+# URL for BloomBERT API (https://github.com/RyanLauQF/BloomBERT?tab=readme-ov-file)
+BLOOM_BERT_URL = os.getenv("BLOOM_BERT_URL", "https://bloom-bert-api-dmkyqqzsta-as.a.run.app/predict")
+BLOOM_BERT_TIMEOUT = float(os.getenv("BLOOM_BERT_TIMEOUT", 5)) # Seconds before a request to the BloomBERT API is abandoned
+BLOOM_BERT_POOL_SIZE = int(os.getenv("BLOOM_BERT_POOL_SIZE", 16)) # Number of connections kept open to the BloomBERT API
+
+BLOOM_CLASSIFIER = os.getenv("BLOOM_CLASSIFIER", "remote") # "remote" (BloomBERT API) or "local" (model loaded in the process)
+# Model artifact of the local classifier: a scikit-learn pipeline file, or a transformers model directory
+# which needs the optional dependencies of requirements-local-bloom.txt (transformers and torch)
+BLOOM_CLASSIFIER_PATH = os.getenv("BLOOM_CLASSIFIER_PATH", "data/bloom_classifier")
+BLOOM_CLASSIFIER_BATCH_SIZE = 32
+
+
+def label_to_level(label):
+    """
+    Convert a label predicted by a classifier to a Bloom level.
+
+    Args:
+        label: Name of the level ("Remember", ...), level (1 to 6) or transformers label ("LABEL_0" to "LABEL_5").
+
+    Returns:
+        int: The Bloom level, or None if the label is unknown.
+    """
+    if isinstance(label, str):
+        if label.startswith("LABEL_"):
+            return int(label[len("LABEL_"):]) + 1
+        if label.isdigit():
+            label = int(label)
+        else:
+            return BLOOM_BERT_MAP.get(label.capitalize())
+    level = int(label)
+    return level if level in range(1, 7) else None
+
+
+class BloomClassifier(ABC):
+    """Abstract base class for the classifiers of the Bloom level of questions."""
+
+    @abstractmethod
+    def classify(self, questions):
+        """
+        Predict the Bloom level of questions.
+
+        Args:
+            questions (list): List of questions (str).
+
+        Returns:
+            list: The predicted level of each question (1 to 6), None when the prediction failed.
+        """
+        pass
+
+    def classify_one(self, question):
+        """Predict the Bloom level of a question (None if the prediction failed)."""
+        return self.classify([question])[0]
+
+
+class RemoteBloomClassifier(BloomClassifier):
+    """Classifier calling the BloomBERT API, over a pool of persistent connections."""
+    def __init__(self, url=BLOOM_BERT_URL, timeout=BLOOM_BERT_TIMEOUT, pool_size=BLOOM_BERT_POOL_SIZE):
+        self.url = url
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        # The API classifies one question per request, the requests of a batch are sent concurrently over the pool
+        self.executor = ThreadPoolExecutor(max_workers=pool_size)
+
+    def classify_request(self, question):
+        """Classify a question with one request to the API (None if the request failed)."""
+        try:
+            response = self.session.post(self.url, json={"text": question}, timeout=self.timeout)
+            response.raise_for_status()
+            return label_to_level(response.json().get("blooms_level"))
+        except Exception as e:
+            print(f"Error: {e}")
+            return None
+
+    def classify(self, questions):
+        if len(questions) == 1:
+            return [self.classify_request(questions[0])]
+        return list(self.executor.map(self.classify_request, questions))
+
+
+class LocalBloomClassifier(BloomClassifier):
+    """
+    Classifier running a model loaded in the process, from a local artifact:
+        - a directory: transformers text classification model (e.g. an exported BloomBERT),
+        - a file: scikit-learn pipeline saved with joblib, predicting the level or its name from the text.
+    """
+    def __init__(self, model_path=BLOOM_CLASSIFIER_PATH, batch_size=BLOOM_CLASSIFIER_BATCH_SIZE):
+        self.model_path = model_path
+        self.batch_size = batch_size
+        if os.path.isdir(model_path):
+            # transformers is only required for this kind of artifact
+            try:
+                from transformers import pipeline
+            except ImportError as e:
+                raise ImportError(f"{model_path} is a transformers model, install the optional dependencies "
+                                  "of the local classifier with: pip install -r requirements-local-bloom.txt") from e
+            self.pipeline = pipeline("text-classification", model=model_path, tokenizer=model_path)
+            self.model = None
+        else:
+            import joblib
+            self.model = joblib.load(model_path)
+            self.pipeline = None
+
+    def classify(self, questions):
+        levels = []
+        for i in range(0, len(questions), self.batch_size):
+            batch = list(questions[i:i + self.batch_size])
+            if self.pipeline is not None:
+                labels = [prediction["label"] for prediction in self.pipeline(batch, batch_size=self.batch_size, truncation=True)]
+            else:
+                labels = list(self.model.predict(batch))
+            levels.extend(label_to_level(label) for label in labels)
+        return levels
+
+
+def get_bloom_classifier(backend=BLOOM_CLASSIFIER):
+    """
+    Create the Bloom level classifier of a backend.
+
+    Args:
+        backend (str): "remote" for the BloomBERT API or "local" for the model at BLOOM_CLASSIFIER_PATH.
+
+    Returns:
+        BloomClassifier: The classifier.
+    """
+    if backend == "remote":
+        return RemoteBloomClassifier()
+    elif backend == "local":
+        return LocalBloomClassifier()
+    raise ValueError(f"Unknown Bloom classifier '{backend}', expected 'remote' or 'local'.")
@@ -1,8 +1,8 @@
 import os
 import json
-import requests
 import sys
 import random
+import asyncio
 
 sys.path.append(os.path.abspath(os.path.join(os.getcwd(), '..')))
 
@@ -10,33 +10,42 @@ from copy import deepcopy
 from langchain_core.messages import SystemMessage, HumanMessage
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
-from utils.prompts import create_prompt, create_refine_prompt, create_judge_prompt
-from utils.helpers import clean_pdf_text
+from utils.prompts import create_prompt, create_refine_prompt, create_judge_prompt, get_output_schema, get_judge_schema
+from utils.helpers import repair_json, parse_partial_json
+from scripts.bloom_classifier import get_bloom_classifier
 from dotenv import load_dotenv
 
 load_dotenv()
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+LLM_MAX_ATTEMPTS = int(os.getenv("LLM_MAX_ATTEMPTS", 3)) # Maximum number of LLM calls to get a valid JSON response
+LLM_CALL_TIMEOUT = float(os.getenv("LLM_CALL_TIMEOUT", 30)) # Deadline of each LLM call (seconds)
 
 BLOOM_TAXONOMY = {1: "Remember", 2: "Understand", 3: "Apply", 4: "Analyze", 5: "Evaluate", 6: "Create"}
-BLOOM_BERT_MAP = {"Remember": 1, "Understand": 2, "Apply": 3, "Analyse": 4, "Evaluate": 5, "Create": 6}
 
-# URL for BloomBERT API (https://github.com/RyanLauQF/BloomBERT?tab=readme-ov-file)
-BLOOM_BERT_URL = "https://bloom-bert-api-dmkyqqzsta-as.a.run.app/predict"
+
+class GenerationError(Exception):
+    """Raised when the LLM does not return a valid response within the retry budget."""
 
 
 class BloomQuestionGenerator:
     """Class to generate questions based on Bloom's Taxonomy"""
-    def __init__(self, model="gpt-4o"):
+    def __init__(self, model="gpt-4o", question_cache=None, question_bank=None, classifier=None, answer_grader=None):
         self.model = model # Use "gpt-4o" to have multimodal capabilities
+        self.question_cache = question_cache # QuestionCache shared across sessions (None to always generate)
+        self.question_bank = question_bank # QuestionBank of pre-generated questions, looked up before the cache
+        self.classifier = classifier or get_bloom_classifier() # BloomClassifier checking the level of the generated questions
+        self.answer_grader = answer_grader # AnswerGrader grading the clear short answers before the LLM judge (None to always judge)
         self.llm = ChatOpenAI(
             model_name=self.model,
             temperature=0.5,
             openai_api_key=OPENAI_API_KEY,
+            timeout=LLM_CALL_TIMEOUT,
+            max_retries=0, # Retries are made by invoke_json, within the LLM_MAX_ATTEMPTS budget
         )
     
 
-    def generate_question(self, docs, question_type="MCQ", level=1, prompt_type="basic", topic=None, different_from=None, refine=False):
+    def generate_question(self, docs, question_type="MCQ", level=1, prompt_type="basic", topic=None, different_from=None, refine=False, nb_candidates=1):
         """
         Generate a question from a chunk based on Bloom's Taxonomy.
 
@@ -47,6 +56,8 @@ class BloomQuestionGenerator:
             prompt_type (str): Type of prompt to use. Options are "basic" or "description".
             different_from (str): Question to generate a different question from.
             refine (bool): Whether to refine the question if it is not correctly classified by Bloom's Taxonomy.
+            nb_candidates (int): Number of candidate questions generated in one LLM call. If greater than 1, the candidates
+                are classified in one batch and the best matching one is kept (and refined only if none matches).
         
         Returns:
             dict: Dictionary containing the generated question and answer options.
@@ -55,37 +66,30 @@ class BloomQuestionGenerator:
         assert question_type in ["MCQ", "SAQ"], "Invalid question type. Options are 'MCQ' or 'SAQ."
         assert level in range(1, 7), "Invalid Bloom's Taxonomy level. Level should be between 1 and 6."
 
-        system_msg, prompt_content = create_prompt(docs, question_type, BLOOM_TAXONOMY[level], prompt_type, topic, different_from)
-       
-        chat_template = ChatPromptTemplate.from_messages(
-            [
-                SystemMessage(content=system_msg),
-                HumanMessage(content=prompt_content)
-            ]
-        )
-        
-        valid = False # Flag to check if the generated question follows the correct format (see sanity_check method)
-
-        while not valid:
-            response = self.llm.invoke(chat_template.format_messages())
-            question_dict = response.content
-            question_dict = clean_pdf_text(question_dict)
-            valid = self.sanity_check(question_dict, question_type)
-
-        question_dict = json.loads(question_dict)
-
-        if refine:
-            question = question_dict["question"]
-            pred_level, is_correct = self.evaluate_question(question, level)
-            if not is_correct:
-                print(f"Refining question: {question} (predicted level: {pred_level}, ground truth level: {level})")
-                if question_type == "MCQ":
-                    # concatenate the question with the answer options
-                    question = question_dict["question"] + "\n"
-                    for letter, answer in question_dict["choices"].items():
-                        question += f"{letter}: {answer}\n"
-                    
+        cache_key, question_dict = self.get_cached_question(docs, question_type, level, prompt_type, topic, different_from)
+        if question_dict is not None:
+            return self.shuffle_mcq(question_dict) if question_type == "MCQ" else question_dict
+
+        messages = self.get_messages(*create_prompt(docs, question_type, BLOOM_TAXONOMY[level], prompt_type, topic, different_from, nb_candidates))
+
+        # Retry until the generated question follows the correct format (see sanity_check method)
+        response_dict = self.invoke_json(messages, 
+                                         lambda content: self.sanity_check_candidates(content, question_type, nb_candidates), 
+                                         get_output_schema(question_type, nb_candidates))
+        candidates = self.get_candidates(response_dict, question_type, nb_candidates)
+
+        if refine or len(candidates) > 1:
+            predictions = self.evaluate_questions([candidate["question"] for candidate in candidates], level)
+            question_dict, pred_level, is_correct = self.select_candidate(candidates, predictions, level)
+            if refine and pred_level is not None and not is_correct:
+                print(f"Refining question: {question_dict['question']} (predicted level: {pred_level}, ground truth level: {level})")
+                question = self.question_to_text(question_dict, question_type)
                 question_dict = self.refine_question(question, docs, pred_level, level, question_type)
+        else:
+            question_dict = candidates[0]
+
+        if cache_key is not None:
+            self.question_cache.put(cache_key, question_dict)
 
         # if the question type is MCQ, shuffle the answer options to make sure the correct answer is not always in the same position due to the prompt
         if question_type == "MCQ":
@@ -94,6 +98,274 @@ class BloomQuestionGenerator:
         return question_dict
     
 
+    async def agenerate_question(self, docs, question_type="MCQ", level=1, prompt_type="basic", topic=None, different_from=None, refine=False, nb_candidates=1):
+        """
+        Async version of generate_question: the LLM and BloomBERT calls are awaited instead of blocking a thread.
+        See generate_question for the arguments and the returned value.
+        """
+
+        assert question_type in ["MCQ", "SAQ"], "Invalid question type. Options are 'MCQ' or 'SAQ."
+        assert level in range(1, 7), "Invalid Bloom's Taxonomy level. Level should be between 1 and 6."
+
+        cache_key, question_dict = self.get_cached_question(docs, question_type, level, prompt_type, topic, different_from)
+        if question_dict is not None:
+            return self.shuffle_mcq(question_dict) if question_type == "MCQ" else question_dict
+
+        candidates = await self.agenerate_candidates(docs, question_type, level, prompt_type, topic, different_from, nb_candidates)
+
+        return await self.afinish_question(candidates, docs, question_type, level, refine, cache_key)
+
+
+    async def agenerate_candidates(self, docs, question_type="MCQ", level=1, prompt_type="basic", topic=None, different_from=None, nb_candidates=1):
+        """
+        Generate candidate questions in one LLM call, without selecting, refining, caching nor shuffling them.
+        See generate_question for the arguments.
+
+        Returns:
+            list: The valid candidate questions (dict).
+        """
+        messages = self.get_messages(*create_prompt(docs, question_type, BLOOM_TAXONOMY[level], prompt_type, topic, different_from, nb_candidates))
+
+        response_dict = await self.ainvoke_json(messages, 
+                                                lambda content: self.sanity_check_candidates(content, question_type, nb_candidates), 
+                                                get_output_schema(question_type, nb_candidates))
+        return self.get_candidates(response_dict, question_type, nb_candidates)
+
+
+    async def astream_question(self, docs, question_type="MCQ", level=1, prompt_type="basic", topic=None, different_from=None, refine=False):
+        """
+        Streaming version of agenerate_question: the response of the LLM is streamed and parsed incrementally, so that
+        the stem of the question can be shown while the rest (choices, answers) is still being generated.
+        See generate_question for the arguments (a single candidate is generated).
+
+        Yields:
+            tuple: ("stem", str) events with the stem of the question received so far, then one ("question", dict) event
+                with the final question. The final stem may differ from the streamed one if the question was refined.
+
+        Raises:
+            GenerationError: If no valid question is generated within the retry budget.
+        """
+
+        assert question_type in ["MCQ", "SAQ"], "Invalid question type. Options are 'MCQ' or 'SAQ."
+        assert level in range(1, 7), "Invalid Bloom's Taxonomy level. Level should be between 1 and 6."
+
+        cache_key, question_dict = self.get_cached_question(docs, question_type, level, prompt_type, topic, different_from)
+        if question_dict is not None:
+            yield "question", self.shuffle_mcq(question_dict) if question_type == "MCQ" else question_dict
+            return
+
+        messages = self.get_messages(*create_prompt(docs, question_type, BLOOM_TAXONOMY[level], prompt_type, topic, different_from))
+        schema = get_output_schema(question_type)
+        check = lambda content: self.sanity_check(content, question_type)
+
+        content, stem = "", ""
+        stream = self.get_structured_llm(schema).astream(messages)
+        # The streamed call is the first attempt of the budget, bounded by LLM_CALL_TIMEOUT as a whole
+        deadline = asyncio.get_running_loop().time() + LLM_CALL_TIMEOUT
+        try:
+            while True:
+                remaining = deadline - asyncio.get_running_loop().time()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError()
+                try:
+                    message_chunk = await asyncio.wait_for(stream.__anext__(), timeout=remaining)
+                except StopAsyncIteration:
+                    break
+                content += message_chunk.content
+                # Only the stem is streamed: the MCQ choices are shuffled once the question is complete
+                partial = parse_partial_json(content)
+                new_stem = partial.get("question") if partial is not None else None
+                if isinstance(new_stem, str) and new_stem != stem:
+                    stem = new_stem
+                    yield "stem", stem
+        except Exception as e:
+            print(f"LLM stream failed (attempt 1/{LLM_MAX_ATTEMPTS}): {e!r}")
+        finally:
+            await stream.aclose()
+
+        content = repair_json(content)
+        if check(content):
+            response_dict = json.loads(content)
+        else:
+            # The remaining attempts of the budget are not streamed
+            response_dict = await self.ainvoke_json(messages, check, schema, max_attempts=LLM_MAX_ATTEMPTS - 1)
+
+        yield "question", await self.afinish_question([response_dict], docs, question_type, level, refine, cache_key)
+
+
+    async def afinish_question(self, candidates, docs, question_type, level, refine, cache_key):
+        """
+        Select the best candidate question (refined if needed), put it in the question cache and shuffle its choices.
+
+        Args:
+            candidates (list): Valid candidate questions generated by the LLM.
+            docs (list): List of documents the questions were generated from.
+            question_type (str): Type of the questions ("MCQ" or "SAQ").
+            level (int): Target Bloom's Taxonomy level.
+            refine (bool): Whether to refine the question if it is not correctly classified by Bloom's Taxonomy.
+            cache_key (str): Key of the question in the question cache, None if it must not be cached.
+
+        Returns:
+            dict: The final question.
+        """
+        if refine or len(candidates) > 1:
+            predictions = await asyncio.to_thread(self.evaluate_questions, [candidate["question"] for candidate in candidates], level)
+            question_dict, pred_level, is_correct = self.select_candidate(candidates, predictions, level)
+            if refine and pred_level is not None and not is_correct:
+                print(f"Refining question: {question_dict['question']} (predicted level: {pred_level}, ground truth level: {level})")
+                question = self.question_to_text(question_dict, question_type)
+                question_dict = await self.arefine_question(question, docs, pred_level, level, question_type)
+        else:
+            question_dict = candidates[0]
+
+        if cache_key is not None:
+            self.question_cache.put(cache_key, question_dict)
+
+        if question_type == "MCQ":
+            question_dict = self.shuffle_mcq(question_dict)
+
+        return question_dict
+
+
+    def get_cached_question(self, docs, question_type, level, prompt_type, topic, different_from):
+        """
+        Look up a question in the question bank, then in the question cache. Questions which must differ 
+        from a previous one are never cached.
+
+        Returns:
+            tuple: (cache_key, question_dict) where cache_key is None if the question must not be cached
+                and question_dict is None on a miss.
+        """
+        if self.question_bank is not None:
+            question_dict = self.question_bank.get(docs, question_type, level, prompt_type, topic, exclude=different_from)
+            if question_dict is not None:
+                return None, question_dict
+
+        if self.question_cache is None or different_from is not None:
+            return None, None
+        cache_key = self.question_cache.get_key(docs, question_type, level, prompt_type, topic)
+        return cache_key, self.question_cache.get(cache_key)
+
+
+    def get_messages(self, system_msg, prompt_content):
+        """
+        Format the messages sent to the LLM.
+
+        Args:
+            system_msg (str): System message.
+            prompt_content (str or list): Content of the human message.
+
+        Returns:
+            list: The formatted messages.
+        """
+        chat_template = ChatPromptTemplate.from_messages(
+            [
+                SystemMessage(content=system_msg),
+                HumanMessage(content=prompt_content)
+            ]
+        )
+        return chat_template.format_messages()
+
+
+    def get_structured_llm(self, schema):
+        """Get the LLM bound to the structured output mode of the provider, constrained to a JSON schema."""
+        return self.llm.bind(response_format={
+            "type": "json_schema",
+            "json_schema": {"name": "output", "schema": schema, "strict": True},
+        })
+
+
+    def invoke_json(self, messages, check, schema, max_attempts=LLM_MAX_ATTEMPTS):
+        """
+        Call the LLM in structured output mode until it returns a JSON string which passes a sanity check,
+        within a budget of max_attempts calls of at most LLM_CALL_TIMEOUT seconds each.
+
+        Args:
+            messages (list): Messages sent to the LLM.
+            check (callable): Sanity check of the repaired response content (see sanity_check).
+            schema (dict): JSON schema of the response.
+            max_attempts (int): Maximum number of LLM calls.
+
+        Returns:
+            dict: The parsed response.
+
+        Raises:
+            GenerationError: If no valid response is returned within the budget.
+        """
+        llm = self.get_structured_llm(schema)
+
+        for attempt in range(max_attempts):
+            try:
+                response = llm.invoke(messages)
+            except Exception as e:
+                print(f"LLM call failed (attempt {attempt + 1}/{max_attempts}): {e!r}")
+                continue
+            content = repair_json(response.content)
+            if check(content):
+                return json.loads(content)
+
+        raise GenerationError(f"No valid response from the LLM after {max_attempts} attempts.")
+
+
+    async def ainvoke_json(self, messages, check, schema, max_attempts=LLM_MAX_ATTEMPTS):
+        """Async version of invoke_json."""
+        llm = self.get_structured_llm(schema)
+
+        for attempt in range(max_attempts):
+            try:
+                response = await asyncio.wait_for(llm.ainvoke(messages), timeout=LLM_CALL_TIMEOUT)
+            except Exception as e:
+                print(f"LLM call failed (attempt {attempt + 1}/{max_attempts}): {e!r}")
+                continue
+            content = repair_json(response.content)
+            if check(content):
+                return json.loads(content)
+
+        raise GenerationError(f"No valid response from the LLM after {max_attempts} attempts.")
+
+
+    def get_candidates(self, response_dict, question_type, nb_candidates):
+        """Get the valid candidate questions of a response (see sanity_check_candidates)."""
+        if nb_candidates == 1:
+            return [response_dict]
+        return [candidate for candidate in response_dict["candidates"] if self.sanity_check(json.dumps(candidate), question_type)]
+
+
+    def select_candidate(self, candidates, predictions, level):
+        """
+        Select the candidate question which best matches the expected Bloom's Taxonomy level.
+
+        Args:
+            candidates (list): List of candidate questions (dict).
+            predictions (list): List of tuples (predicted level, is at the expected level) of the candidates (see evaluate_questions).
+            level (int): Expected Bloom's Taxonomy level.
+
+        Returns:
+            tuple: (dict, int, bool): The first candidate at the expected level or else the one with the closest predicted level 
+                (the first one if no level could be predicted), its predicted level and whether it is at the expected level.
+        """
+        for candidate, (pred_level, is_correct) in zip(candidates, predictions):
+            if is_correct:
+                return candidate, pred_level, True
+
+        # No candidate at the expected level, keep the closest one (to be refined)
+        predicted = [(abs(pred_level - level), i) for i, (pred_level, _) in enumerate(predictions) if pred_level is not None]
+        i = min(predicted)[1] if predicted else 0
+        return candidates[i], predictions[i][0], False
+
+
+    def question_to_text(self, question_dict, question_type):
+        """Get the text of a question to refine, with its answer options for MCQ."""
+        if question_type != "MCQ":
+            return question_dict["question"]
+
+        # concatenate the question with the answer options
+        question = question_dict["question"] + "\n"
+        for letter, answer in question_dict["choices"].items():
+            question += f"{letter}: {answer}\n"
+        return question
+
+
     def refine_question(self, question, docs, pred_level, gt_level, question_type="MCQ"):
         """
         Refine a generated question which has been not correctly classified by Bloom's Taxonomy with BloomBERT.
@@ -109,26 +381,16 @@ class BloomQuestionGenerator:
             dict: Dictionary containing the refined question and answer options.
         """
 
-        system_msg, prompt_content = create_refine_prompt(docs, question, question_type, BLOOM_TAXONOMY[gt_level], BLOOM_TAXONOMY[pred_level])
-
-        chat_template = ChatPromptTemplate.from_messages(
-            [
-                SystemMessage(content=system_msg),
-                HumanMessage(content=prompt_content)
-            ]
-        )
-
-        valid = False
+        messages = self.get_messages(*create_refine_prompt(docs, question, question_type, BLOOM_TAXONOMY[gt_level], BLOOM_TAXONOMY[pred_level]))
 
-        while not valid:
-            response = self.llm.invoke(chat_template.format_messages())
-            refined_question_dict = response.content
-            refined_question_dict = clean_pdf_text(refined_question_dict)
-            valid = self.sanity_check(refined_question_dict, question_type)
+        return self.invoke_json(messages, lambda content: self.sanity_check(content, question_type), get_output_schema(question_type))
+    
 
-        refined_question_dict = json.loads(refined_question_dict)
+    async def arefine_question(self, question, docs, pred_level, gt_level, question_type="MCQ"):
+        """Async version of refine_question."""
+        messages = self.get_messages(*create_refine_prompt(docs, question, question_type, BLOOM_TAXONOMY[gt_level], BLOOM_TAXONOMY[pred_level]))
 
-        return refined_question_dict
+        return await self.ainvoke_json(messages, lambda content: self.sanity_check(content, question_type), get_output_schema(question_type))
     
 
     def shuffle_mcq(self, question_dict):
@@ -161,37 +423,37 @@ class BloomQuestionGenerator:
 
     def evaluate_question(self, question, level):
         """
-        Evaluate the Bloom's Taxonomy level of a generated question using BloomBERT.
+        Evaluate the Bloom's Taxonomy level of a generated question with the Bloom classifier (e.g. BloomBERT).
 
         Args:
             question (str): Question to evaluate.
             level (int): Bloom's Taxonomy level to compare with (ground truth).
 
         Returns:
-            bool: True if the question is at the correct Bloom's Taxonomy level, False otherwise.
+            tuple: (int, bool): The predicted level (None if the classification failed) and whether it is the expected level.
         """
 
-        assert level in range(1, 7), "Invalid Bloom's Taxonomy level. Level should be between 1 and 6."
+        return self.evaluate_questions([question], level)[0]
 
-        question_data = {"text": question}
-
-        try:
-            response = requests.post(BLOOM_BERT_URL, json=question_data)
 
-            response.raise_for_status()
+    def evaluate_questions(self, questions, level):
+        """
+        Evaluate the Bloom's Taxonomy level of generated questions in one batch (see evaluate_question).
 
-            response_dict = response.json()
+        Args:
+            questions (list): Questions to evaluate.
+            level (int): Bloom's Taxonomy level to compare with (ground truth).
 
-            predicted_level = BLOOM_BERT_MAP.get(response_dict.get("blooms_level"))
+        Returns:
+            list: List of tuples (predicted level, is at the expected level) for each question.
+        """
 
-            return predicted_level, predicted_level == level
+        assert level in range(1, 7), "Invalid Bloom's Taxonomy level. Level should be between 1 and 6."
 
-        except Exception as e:
-            print(f"Error: {e}")
-            return False        
+        return [(predicted_level, predicted_level == level) for predicted_level in self.classifier.classify(questions)]
 
 
-    def check_answer_saq(self, docs, question, answer):
+    def check_answer_saq(self, docs, question, answer, reference=None):
         """
         Check if the answer to a short answer question is correct.
 
@@ -199,29 +461,40 @@ class BloomQuestionGenerator:
             docs (list): List of documents to check the answer against.
             question (str): Question to check the answer for.
             answer (str): User answer to the question.
+            reference (dict): Reference answers generated with the question ("correct_answer" and "incorrect_answer"),
+                used by the answer grader to skip the LLM judge when the verdict is clear.
 
         Returns:
             tuple: (bool, str): Tuple containing a boolean indicating if the answer is correct and feedback.
         """
+        if self.answer_grader is not None:
+            verdict = self.answer_grader.grade(question, answer, reference)
+            if verdict is not None:
+                return verdict
 
-        system_msg, prompt_content = create_judge_prompt(docs, question, answer)
+        messages = self.get_messages(*create_judge_prompt(docs, question, answer))
 
-        chat_template = ChatPromptTemplate.from_messages(
-            [
-                SystemMessage(content=system_msg),
-                HumanMessage(content=prompt_content)
-            ]
-        )
-            
-        valid = False
+        correction_dict = self.invoke_json(messages, self.sanity_check_judge, get_judge_schema())
 
-        while not valid:
-            response = self.llm.invoke(chat_template.format_messages())
-            correction_dict_str = response.content
-            correction_dict_str = clean_pdf_text(correction_dict_str)
-            valid = self.sanity_check_judge(correction_dict_str)
-        
-        correction_dict = json.loads(correction_dict_str)
+        if self.answer_grader is not None:
+            self.answer_grader.remember(question, answer, correction_dict["is_correct"], correction_dict["feedback"])
+
+        return correction_dict["is_correct"], correction_dict["feedback"]
+    
+
+    async def acheck_answer_saq(self, docs, question, answer, reference=None):
+        """Async version of check_answer_saq."""
+        if self.answer_grader is not None:
+            verdict = await asyncio.to_thread(self.answer_grader.grade, question, answer, reference)
+            if verdict is not None:
+                return verdict
+
+        messages = self.get_messages(*create_judge_prompt(docs, question, answer))
+
+        correction_dict = await self.ainvoke_json(messages, self.sanity_check_judge, get_judge_schema())
+
+        if self.answer_grader is not None:
+            self.answer_grader.remember(question, answer, correction_dict["is_correct"], correction_dict["feedback"])
 
         return correction_dict["is_correct"], correction_dict["feedback"]
     
@@ -296,6 +569,37 @@ class BloomQuestionGenerator:
             return False
         
 
+    def sanity_check_candidates(self, response_str, question_type, nb_candidates):
+        """
+        Perform a sanity check on a response containing candidate questions: with a single candidate, the response
+        is the question itself, otherwise it must contain a list of candidates of which at least one is valid.
+
+        Args:
+            response_str (str): Generated response in string format.
+            question_type (str): Type of question to generate. Options are "MCQ" or "SAQ".
+            nb_candidates (int): Number of candidate questions requested.
+
+        Returns:
+            bool: True if the response is valid, False otherwise.
+        """
+
+        if nb_candidates == 1:
+            return self.sanity_check(response_str, question_type)
+
+        try:
+            response_dict = json.loads(response_str)
+        except json.JSONDecodeError:
+            print("Error decoding JSON string.")
+            print(f"Generated string: {response_str}")
+            return False
+
+        if not isinstance(response_dict, dict) or not isinstance(response_dict.get("candidates"), list):
+            print("Sanity check failed: Candidates are missing.")
+            return False
+
+        return any(self.sanity_check(json.dumps(candidate), question_type) for candidate in response_dict["candidates"])
+        
+
     def sanity_check_judge(self, correction_dict_str):
         """
         Perform a sanity check on the generated correction.
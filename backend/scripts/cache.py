@@ -0,0 +1,422 @@
+import os
+import json
+import time
+import copy
+import random
+import hashlib
+import sqlite3
+import unicodedata
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+CHUNK_CACHE_DIR = os.getenv("CHUNK_CACHE_DIR", "data/chunk_cache")
+CHUNK_CACHE_MAX_MB = int(os.getenv("CHUNK_CACHE_MAX_MB", 1024))
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "data/embedding_cache.sqlite")
+EMBEDDING_CACHE_MAX_MB = int(os.getenv("EMBEDDING_CACHE_MAX_MB", 32)) # Size of the in-memory tier (per process)
+EMBEDDING_CACHE_DISK_MAX_ITEMS = int(os.getenv("EMBEDDING_CACHE_DISK_MAX_ITEMS", 100000)) # ~600 MB of 1536-dim vectors
+EMBEDDING_CACHE_BATCH = 500 # Maximum number of keys looked up on disk per query
+QUESTION_CACHE_TTL = float(os.getenv("QUESTION_CACHE_TTL", 7 * 24 * 3600)) # Seconds a generated question is served
+QUESTION_CACHE_MAX_KEYS = int(os.getenv("QUESTION_CACHE_MAX_KEYS", 10000))
+QUESTION_CACHE_VARIANTS = int(os.getenv("QUESTION_CACHE_VARIANTS", 5)) # Maximum number of questions kept per key
+QUESTION_CACHE_FRESH_RATIO = float(os.getenv("QUESTION_CACHE_FRESH_RATIO", 0.2)) # Share of lookups answered by a new generation
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", 7 * 24 * 3600)) # Seconds a verdict on a short answer is reused
+ANSWER_CACHE_MAX_ITEMS = int(os.getenv("ANSWER_CACHE_MAX_ITEMS", 50000))
+
+
+def get_chunk_hash(docs):
+    """
+    Get the hash of the content of a chunk.
+
+    Args:
+        docs (list): List of documents of the chunk.
+
+    Returns:
+        str: SHA-256 hex digest of the content of the documents.
+    """
+    chunk_hash = hashlib.sha256()
+    for doc in docs:
+        chunk_hash.update(doc.page_content.encode("utf-8"))
+        chunk_hash.update(b"\0")
+    return chunk_hash.hexdigest()
+
+
+class ChunkCache:
+    """
+    Content-addressed on-disk cache of processed PDF chunks.
+
+    Entries are keyed by the hash of the file bytes and of the parameters used to process it, so that
+    changing a parameter invalidates the stale entries. The least recently used entries are evicted
+    once the total size of the cache exceeds max_size_mb.
+    """
+    def __init__(self, cache_dir=CHUNK_CACHE_DIR, max_size_mb=CHUNK_CACHE_MAX_MB):
+        self.cache_dir = cache_dir
+        self.max_size = max_size_mb * 1024 * 1024
+        self.lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def get_key(self, file_hash, params):
+        """
+        Get the cache key of a file.
+
+        Args:
+            file_hash (str): SHA-256 hex digest of the content of the file.
+            params (dict): Parameters used to process the file.
+
+        Returns:
+            str: The cache key.
+        """
+        params_hash = hashlib.sha256(json.dumps(params, sort_keys=True).encode("utf-8")).hexdigest()
+        return f"{file_hash}_{params_hash[:16]}"
+
+    def get_path(self, key):
+        """Get the path of the cache entry of a key."""
+        return os.path.join(self.cache_dir, f"{key}.chunks")
+
+    def get(self, key):
+        """
+        Look up a cache entry.
+
+        Args:
+            key (str): The cache key.
+
+        Returns:
+            str: Path of the stored chunks (to be loaded with PDFChunker(load_path=...)) or None on a miss.
+        """
+        path = self.get_path(key)
+        try:
+            # Update the modification time to mark the entry as recently used
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, key, chunker):
+        """
+        Store the chunks of a PDFChunker in the cache.
+
+        Args:
+            key (str): The cache key.
+            chunker (PDFChunker): The chunker holding the processed chunks.
+        """
+        path = self.get_path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        chunker.save_chunks(tmp_path)
+        # Atomic rename so that a concurrent reader never sees a partially written entry
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def evict(self):
+        """Remove the least recently used entries until the cache fits in its maximum size."""
+        with self.lock:
+            entries = []
+            for filename in os.listdir(self.cache_dir):
+                if filename.endswith(".tmp"): continue
+                path = os.path.join(self.cache_dir, filename)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+            total_size = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total_size <= self.max_size:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                except PermissionError:
+                    # Still mapped by a session (Windows), removed by a later eviction once the session is closed
+                    continue
+                total_size -= size
+
+
+class EmbeddingCache:
+    """
+    Two-tier cache of text embeddings, keyed by the embedding model and the hash of the text.
+
+    The most recently used vectors are kept in memory (LRU of at most max_memory_mb) and the vectors
+    are persisted in a SQLite file as raw float32 bytes, so that repeated content (re-uploads,
+    Neo4j-sourced chunks) is embedded without calling the embedding API again. The least recently
+    used rows of the file are evicted beyond max_disk_items.
+    """
+    def __init__(self, path=EMBEDDING_CACHE_PATH, max_memory_mb=EMBEDDING_CACHE_MAX_MB, max_disk_items=EMBEDDING_CACHE_DISK_MAX_ITEMS):
+        self.path = path
+        self.max_memory = max_memory_mb * 1024 * 1024
+        self.max_disk_items = max_disk_items
+        self.memory = OrderedDict()
+        self.memory_size = 0 # Bytes of the vectors of the in-memory tier
+        self.lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+        # Last use of the rows, added to the files created before the disk tier was bounded
+        columns = [row[1] for row in self.db.execute("PRAGMA table_info(embeddings)")]
+        if "last_used" not in columns:
+            self.db.execute("ALTER TABLE embeddings ADD COLUMN last_used REAL NOT NULL DEFAULT 0")
+        self.db.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self.db.commit()
+
+    def get_key(self, model, text):
+        """Get the cache key of a text embedded with a model."""
+        return f"{model}:{hashlib.sha256(text.encode('utf-8')).hexdigest()}"
+
+    def remember(self, key, vector):
+        """Store a vector in the in-memory tier, evicting the least recently used ones."""
+        previous = self.memory.pop(key, None)
+        if previous is not None:
+            self.memory_size -= previous.nbytes
+        self.memory[key] = vector
+        self.memory_size += vector.nbytes
+        while self.memory_size > self.max_memory and self.memory:
+            _, evicted = self.memory.popitem(last=False)
+            self.memory_size -= evicted.nbytes
+
+    def evict(self):
+        """Remove the least recently used rows of the disk tier beyond max_disk_items (called with the lock held)."""
+        nb_rows = self.db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        if nb_rows > self.max_disk_items:
+            self.db.execute(
+                "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                (nb_rows - self.max_disk_items,),
+            )
+
+    def get_many(self, keys):
+        """
+        Look up vectors in the memory tier, then in the disk tier.
+
+        Args:
+            keys (list): List of cache keys.
+
+        Returns:
+            dict: The vectors (float32 numpy arrays) found, by key.
+        """
+        found = {}
+        with self.lock:
+            missing = []
+            for key in keys:
+                vector = self.memory.get(key)
+                if vector is None:
+                    missing.append(key)
+                else:
+                    self.memory.move_to_end(key)
+                    found[key] = vector
+
+            for i in range(0, len(missing), EMBEDDING_CACHE_BATCH):
+                batch = missing[i:i + EMBEDDING_CACHE_BATCH]
+                rows = self.db.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    vector = np.frombuffer(blob, dtype=np.float32)
+                    self.remember(key, vector)
+                    found[key] = vector
+                if rows:
+                    # Mark the rows as recently used so that they are evicted last
+                    now = time.time()
+                    self.db.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?", [(now, key) for key, _ in rows])
+                    self.db.commit()
+        return found
+
+    def put_many(self, items):
+        """
+        Store vectors in both tiers.
+
+        Args:
+            items (dict): The vectors to store, by key.
+
+        Returns:
+            dict: The stored vectors (float32 numpy arrays), by key.
+        """
+        vectors = {key: np.asarray(vector, dtype=np.float32) for key, vector in items.items()}
+        with self.lock:
+            for key, vector in vectors.items():
+                self.remember(key, vector)
+            now = time.time()
+            self.db.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                [(key, vector.tobytes(), now) for key, vector in vectors.items()],
+            )
+            self.evict()
+            self.db.commit()
+        return vectors
+
+    def embed(self, texts, embed_function, model):
+        """
+        Embed texts, only calling the embedding function on the texts that are not cached.
+
+        Args:
+            texts (list): List of texts to embed.
+            embed_function (callable): Function embedding a list of texts (e.g. embed_documents).
+            model (str): Name of the embedding model (part of the cache key).
+
+        Returns:
+            list: The embeddings of the texts (lists of float), in order.
+        """
+        keys = [self.get_key(model, text) for text in texts]
+        found = self.get_many(keys)
+
+        # Embed each missing text once, even if it appears several times
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        if missing:
+            vectors = embed_function(list(missing.values()))
+            found.update(self.put_many(dict(zip(missing.keys(), vectors))))
+
+        return [found[key].tolist() for key in keys]
+
+
+class QuestionCache:
+    """
+    In-memory cache of generated questions shared by all the sessions, keyed by the content of the chunk,
+    the question type, the Bloom level, the prompt type and the topic.
+
+    Each key holds up to max_variants questions, one of them is served at random. To keep some variety, a
+    share fresh_ratio of the lookups are misses so that a new question is generated and added as a variant.
+    The variants expire after ttl seconds and the least recently used keys are evicted beyond max_keys.
+    """
+    def __init__(self, 
+                 ttl=QUESTION_CACHE_TTL, 
+                 max_keys=QUESTION_CACHE_MAX_KEYS, 
+                 max_variants=QUESTION_CACHE_VARIANTS, 
+                 fresh_ratio=QUESTION_CACHE_FRESH_RATIO):
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self.max_variants = max_variants
+        self.fresh_ratio = fresh_ratio
+        self.entries = OrderedDict() # key -> list of (creation time, question dict)
+        self.lock = threading.Lock()
+
+    def get_key(self, docs, question_type, level, prompt_type, topic):
+        """
+        Get the cache key of a question.
+
+        Args:
+            docs (list): List of documents (chunk) the question is generated from.
+            question_type (str): Type of question ("MCQ" or "SAQ").
+            level (int): Bloom's Taxonomy level.
+            prompt_type (str): Type of prompt.
+            topic (str): Topic of the course.
+
+        Returns:
+            str: The cache key.
+        """
+        return f"{get_chunk_hash(docs)}_{question_type}_{level}_{prompt_type}_{topic}"
+
+    def get(self, key):
+        """
+        Look up a question.
+
+        Args:
+            key (str): The cache key.
+
+        Returns:
+            dict: A copy of one of the cached questions, or None on a miss (or when a fresh question should be generated).
+        """
+        with self.lock:
+            variants = self.entries.get(key)
+            if variants is None:
+                return None
+
+            now = time.time()
+            variants[:] = [(created, question) for created, question in variants if now - created < self.ttl]
+            if not variants:
+                del self.entries[key]
+                return None
+
+            self.entries.move_to_end(key)
+            if random.random() < self.fresh_ratio:
+                return None
+            return copy.deepcopy(random.choice(variants)[1])
+
+    def put(self, key, question_dict):
+        """
+        Add a question to the variants of a key, replacing the oldest one when the key is full.
+
+        Args:
+            key (str): The cache key.
+            question_dict (dict): The generated question.
+        """
+        with self.lock:
+            variants = self.entries.setdefault(key, [])
+            variants.append((time.time(), copy.deepcopy(question_dict)))
+            del variants[:-self.max_variants]
+
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_keys:
+                self.entries.popitem(last=False)
+
+
+def normalize_answer(answer):
+    """
+    Normalize a short answer for matching: lowercase, without accents, punctuation and extra whitespace.
+
+    Args:
+        answer (str): The answer.
+
+    Returns:
+        str: The normalized answer.
+    """
+    answer = unicodedata.normalize("NFKD", answer)
+    answer = "".join(char for char in answer if not unicodedata.combining(char)).lower()
+    answer = "".join(char if char.isalnum() else " " for char in answer)
+    return " ".join(answer.split())
+
+
+class AnswerCache:
+    """
+    In-memory cache of the verdicts on short answers shared by all the sessions, keyed by the question and the
+    normalized answer, so that the same answer to the same question is never judged twice.
+
+    The verdicts expire after ttl seconds and the least recently used ones are evicted beyond max_items.
+    """
+    def __init__(self, ttl=ANSWER_CACHE_TTL, max_items=ANSWER_CACHE_MAX_ITEMS):
+        self.ttl = ttl
+        self.max_items = max_items
+        self.entries = OrderedDict() # key -> (creation time, (is_correct, feedback))
+        self.lock = threading.Lock()
+
+    def get_key(self, question, answer):
+        """
+        Get the cache key of an answer to a question.
+
+        Args:
+            question (str): The question.
+            answer (str): The answer of the learner.
+
+        Returns:
+            str: The cache key.
+        """
+        return hashlib.sha256(f"{question}\0{normalize_answer(answer)}".encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """
+        Look up a verdict.
+
+        Returns:
+            tuple: (is_correct, feedback), or None on a miss.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if time.time() - entry[0] >= self.ttl:
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, is_correct, feedback):
+        """Store a verdict, evicting the least recently used ones beyond max_items."""
+        with self.lock:
+            self.entries[key] = (time.time(), (is_correct, feedback))
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_items:
+                self.entries.popitem(last=False)
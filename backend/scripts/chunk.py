@@ -2,7 +2,10 @@ import os
 import io
 import json
 import base64
+import codecs
 import sys
+import tempfile
+import multiprocessing
 
 sys.path.append(os.path.abspath(os.path.join(os.getcwd(), '..')))
 
@@ -12,7 +15,6 @@ from unstructured.documents.elements import *
 from PIL import Image as PILImage, ImageDraw
 
 
-from langchain_openai import OpenAIEmbeddings
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_experimental.text_splitter import SemanticChunker
 from langchain_core.documents import Document
@@ -20,9 +22,17 @@ from langchain_core.documents import Document
 from chunking_evaluation.chunking import ClusterSemanticChunker, LLMSemanticChunker
 
 from semantic_chunkers import StatisticalChunker
-from semantic_router.encoders import OpenAIEncoder
 
 from unstructured.partition.pdf import partition_pdf
+from unstructured.chunking.title import chunk_by_title
+from unstructured.documents.coordinates import PixelSpace
+from unstructured.documents.elements import CoordinatesMetadata
+
+from scripts.encoders import get_embedding_model, get_encoder_model
+from scripts.statistical_chunker import VectorizedStatisticalChunker
+from scripts.chunk_store import ChunkStore, Base64Images, is_chunk_store, write_chunk_store
+
+from concurrent.futures import ProcessPoolExecutor
 
 
 from dotenv import load_dotenv
@@ -32,14 +42,72 @@ load_dotenv()
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 SEPARATORS = ["\n\n", "\n", ".", "?", "!", " ", ""]
+PDF_DPI = 200 # Resolution used by unstructured (hi_res) for the element coordinates
+CHUNKING_PARAMS = {"max_characters": 1500, "combine_text_under_n_chars": 500, "new_after_n_chars": 1000}
+PARTITION_KWARGS = {
+    "infer_table_structure": True,
+    "strategy": "hi_res",
+    "extract_image_block_types": ["Image"],
+    "extract_image_block_to_payload": True,
+}
+FAST_PARTITION_KWARGS = {"strategy": "fast"}
+FAST_DPI = 72 # The fast strategy gives the element coordinates in PDF points
+# Thresholds to decide that a page needs the hi_res strategy (see PDFChunker.get_page_strategies)
+MIN_TEXT_LAYER_CHARS = 20 # below, the page is considered scanned (no text layer) and needs OCR
+MIN_TABLE_LINES = 8 # from this number of vector lines/rectangles, the page is considered to contain a table
+TEXT_WINDOW_CHARS = 200_000 # Size of the paragraph windows chunked one at a time by the StreamingTextChunker
+TEXT_READ_SIZE = 1024 * 1024 # Size of the blocks in which text files are read and decoded
+
+
+def partition_pages(pdf_path, first_page=1, strategy="hi_res"):
+    """
+    Partition a PDF file containing a page range of a larger PDF into elements (without chunking).
+
+    Args:
+        pdf_path (str): Path to the PDF file of the page range.
+        first_page (int): Page number of the first page of the range in the original PDF (1-indexed).
+        strategy (str): Partition strategy, "hi_res" or "fast".
+
+    Returns:
+        list: List of elements with page numbers relative to the original PDF and coordinates in the hi_res pixel space.
+    """
+    if strategy == "hi_res":
+        elements = partition_pdf(filename=pdf_path, **PARTITION_KWARGS)
+    elif strategy == "fast":
+        elements = partition_pdf(filename=pdf_path, **FAST_PARTITION_KWARGS)
+    else:
+        raise ValueError("Invalid strategy. Options are 'hi_res' or 'fast'.")
+
+    for el in elements:
+        if el.metadata.page_number is not None:
+            el.metadata.page_number += first_page - 1
+        if strategy == "fast" and el.metadata.coordinates is not None:
+            # Scale the coordinates from PDF points to the hi_res pixel space so that crop_chunk_on_page works the same
+            scale = PDF_DPI / FAST_DPI
+            system = el.metadata.coordinates.system
+            el.metadata.coordinates = CoordinatesMetadata(
+                points=tuple((x * scale, y * scale) for x, y in el.metadata.coordinates.points),
+                system=PixelSpace(width=system.width * scale, height=system.height * scale),
+            )
+    return elements
+
 
 class TextChunker:
     """A class which implements many methods for create bite-sized blocks of text."""
-    def __init__(self, text, output_document=True):
+    def __init__(self, text, output_document=True, embedding_backend=None):
         self.text = text
         self.output_document = output_document
-        self.embedding_model = OpenAIEmbeddings(api_key=OPENAI_API_KEY)
-        self.encoder_model = OpenAIEncoder(name="text-embedding-3-small")
+        self.embedding_backend = embedding_backend # Embedding backend of the semantic chunkers (None for EMBEDDING_BACKEND)
+
+    @property
+    def embedding_model(self):
+        """Shared embedding model (behind the embedding cache), created on first use."""
+        return get_embedding_model(cached=True, backend=self.embedding_backend)
+
+    @property
+    def encoder_model(self):
+        """Shared encoder (for the StatisticalChunker, behind the embedding cache), created on first use."""
+        return get_encoder_model(name="text-embedding-3-small", cached=True, backend=self.embedding_backend)
 
     def recursive_chunk(self, chunk_size=500, chunk_overlap=0, by_tokens=False):
         """Chunk text recursively."""
@@ -87,6 +155,17 @@ class TextChunker:
         chunks = splitter(docs=[self.text])[0]
         chunk_texts = [' '.join(chunk.splits) for chunk in chunks]
         return self.output_format(chunk_texts)
+
+    def vectorized_statistical_chunk(self, window_size=5, min_split_tokens=100, max_split_tokens=300):
+        """Chunk text based on statistical methods, with split points computed at once with NumPy."""
+        splitter = VectorizedStatisticalChunker(
+            embedding_function=self.embedding_model.embed_documents,
+            window_size=window_size,
+            min_split_tokens=min_split_tokens,
+            max_split_tokens=max_split_tokens
+        )
+        chunks = splitter.split_text(self.text)
+        return self.output_format(chunks)
     
     def output_format(self, chunks):
         """Format the output."""
@@ -95,60 +174,295 @@ class TextChunker:
         return chunks
     
 
+class StreamingTextChunker:
+    """
+    A class which chunks a large text file by windows of paragraphs, so that the whole text is never held in memory.
+    The file is decoded incrementally and each window is chunked with a TextChunker method as soon as it is read.
+    """
+    def __init__(self, 
+                 path, 
+                 method="statistical_chunk", 
+                 window_chars=TEXT_WINDOW_CHARS, 
+                 output_document=True, 
+                 embedding_backend=None, 
+                 progress_callback=None, 
+                 **method_kwargs):
+        self.path = path
+        self.method = method # Name of the TextChunker method used to chunk each window
+        self.method_kwargs = method_kwargs
+        self.window_chars = window_chars
+        self.output_document = output_document
+        self.embedding_backend = embedding_backend
+        self.progress_callback = progress_callback # Called with ("partition", bytes read, file size)
+
+    def read_windows(self):
+        """
+        Read the file by windows of about window_chars characters, cut at paragraph (or line) boundaries.
+
+        Yields:
+            str: The text of each window.
+        """
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        file_size = os.path.getsize(self.path)
+        bytes_read = 0
+        buffer = ""
+        with open(self.path, "rb") as f:
+            while True:
+                block = f.read(TEXT_READ_SIZE)
+                bytes_read += len(block)
+                buffer += decoder.decode(block, final=not block)
+
+                while len(buffer) >= self.window_chars:
+                    cut = buffer.rfind("\n\n", 0, self.window_chars)
+                    if cut <= 0:
+                        cut = buffer.rfind("\n", 0, self.window_chars)
+                    if cut <= 0:
+                        cut = self.window_chars
+                    window, buffer = buffer[:cut], buffer[cut:].lstrip("\n")
+                    if window.strip():
+                        yield window
+
+                if self.progress_callback is not None:
+                    self.progress_callback("partition", bytes_read, file_size)
+                if not block:
+                    break
+
+        if buffer.strip():
+            yield buffer
+
+    def stream_chunks(self):
+        """
+        Chunk the file window by window.
+
+        Yields:
+            The chunks, in the format of TextChunker.output_format.
+        """
+        for window in self.read_windows():
+            chunker = TextChunker(window, output_document=self.output_document, embedding_backend=self.embedding_backend)
+            yield from getattr(chunker, self.method)(**self.method_kwargs)
+
+
 class PDFChunker:
     """A class which extracts content from PDFs and chunks it."""
-    def __init__(self, pdf_path=None, file_obj=None, load_path=None):
+    def __init__(self, 
+                 pdf_path=None, 
+                 file_obj=None, 
+                 load_path=None, 
+                 progress_callback=None, 
+                 nb_workers=1, 
+                 pages_per_split=4, 
+                 stream=False, 
+                 strategy="hi_res",
+                 image_profile="display", 
+                 llm_image_profile="llm"):
         self.pdf_path = pdf_path
         self.file_obj = file_obj
         self.load_path = load_path
+        self.nb_workers = nb_workers # If greater than 1, page ranges of the PDF are partitioned in parallel processes
+        self.pages_per_split = pages_per_split # Number of pages in each page range when partitioning in parallel
+        self.progress_callback = progress_callback # Called with (stage, done, total) while processing the PDF
+        self.stream = stream # If True, only partition here and process the chunks one by one with stream_chunks()
+        self.strategy = strategy # "hi_res" for all the pages, or "auto" to use hi_res only on pages with images, tables or no text layer
+        self.image_profile = get_image_profile(image_profile) # Encoding (and render dpi) of the chunk images shown to the learner
+        self.llm_image_profile = get_image_profile(llm_image_profile) if llm_image_profile else None # Encoding of the images sent to the LLM
+        self.render_scale = self.image_profile["dpi"] / PDF_DPI # Scale from the element coordinates to the rendered pages
+        self.page_images = {} # Cache of rendered pages (page number -> PIL image), filled lazily
+        self.nb_pages_to_render = 0
+        self.chunk_store = None # Memory-mapped chunk store when the chunks are loaded from a binary file
         if self.load_path:
-            self.formated_chunks, self.chunks_img_b64 = self.load_chunks(self.load_path)
+            self.formated_chunks, self.chunks_img_bytes = self.load_chunks(self.load_path)
         else:
-            self.chunks = self.partition()
-            self.formated_chunks = [self.format_chunk(chunk) for chunk in self.chunks]
-            self.chunks_img = [self.crop_chunk_on_page(chunk) for chunk in self.chunks]
-            self.chunks_img_b64 = [self.pil_image_to_base64(chunk) for chunk in self.chunks_img]
+            self.report_progress("partition", 0, 1)
+            self.chunks = self.partition(**CHUNKING_PARAMS)
+            self.report_progress("partition", 1, 1)
+            self.nb_pages_to_render = len(self.get_chunk_pages(self.chunks))
+            self.formated_chunks = []
+            self.chunks_img = []
+            self.chunks_img_bytes = []
+        # Base64 view of the encoded chunk images, the images are only base64-encoded when accessed
+        self.chunks_img_b64 = Base64Images(self.chunks_img_bytes)
+        if not self.load_path and not self.stream:
+            for _ in self.stream_chunks(): pass
+
+    def stream_chunks(self):
+        """
+        Format, crop and encode the partitioned chunks one by one. The results are also appended to 
+        formated_chunks, chunks_img and chunks_img_bytes so that the chunker holds all the chunks at the end.
+
+        Yields:
+            tuple: (formated_chunk, chunk_img_bytes) for each chunk, in order.
+        """
+        total = len(self.chunks)
+        for i, chunk in enumerate(self.chunks):
+            formated_chunk = self.format_chunk(chunk)
+            chunk_img = self.crop_chunk_on_page(chunk)
+            self.report_progress("crop", i + 1, total)
+            chunk_img_bytes = self.pil_image_to_bytes(chunk_img)
+            self.report_progress("encode", i + 1, total)
+
+            self.formated_chunks.append(formated_chunk)
+            self.chunks_img.append(chunk_img)
+            self.chunks_img_bytes.append(chunk_img_bytes)
+            yield formated_chunk, chunk_img_bytes
+
+        self.release_page_images()
+
+    def report_progress(self, stage, done, total):
+        """Report the progress of a processing stage to the progress callback (if any)."""
+        if self.progress_callback is not None:
+            self.progress_callback(stage, done, total)
+
+    def get_chunk_pages(self, chunks):
+        """Get the set of page numbers on which the elements of the chunks are located."""
+        pages = set()
+        for chunk in chunks:
+            for el in chunk.metadata.orig_elements:
+                if el.to_dict().get("type") == "UncategorizedText": continue
+                pages.add(el.metadata.page_number)
+        return pages
 
     def partition(self, max_characters=1500, combine_text_under_n_chars=500, new_after_n_chars=1000):
         """Partition the PDF into chunks."""
+        if not self.file_obj and not self.pdf_path:
+            raise ValueError("Either pdf_path or file_obj must be provided.")
+
+        if self.nb_workers > 1 or self.strategy == "auto":
+            elements = self.partition_page_ranges()
+            return chunk_by_title(
+                elements,
+                max_characters=max_characters,
+                combine_text_under_n_chars=combine_text_under_n_chars,
+                new_after_n_chars=new_after_n_chars,
+            )
+
         if self.file_obj:
             chunks = partition_pdf(
                 file=self.file_obj,
-                infer_table_structure=True,
-                strategy="hi_res", 
-                extract_image_block_types=["Image"],
-                extract_image_block_to_payload=True,
+                **PARTITION_KWARGS,
                 chunking_strategy="by_title",
                 max_characters=max_characters,
                 combine_text_under_n_chars=combine_text_under_n_chars,
                 new_after_n_chars=new_after_n_chars,
             )
-        elif self.pdf_path:
+        else:
             chunks = partition_pdf(
                 filename=self.pdf_path,
-                infer_table_structure=True,
-                strategy="hi_res", 
-                extract_image_block_types=["Image"],
-                extract_image_block_to_payload=True,
+                **PARTITION_KWARGS,
                 chunking_strategy="by_title",
                 max_characters=max_characters,
                 combine_text_under_n_chars=combine_text_under_n_chars,
                 new_after_n_chars=new_after_n_chars,
             )
-        else:
-            raise ValueError("Either pdf_path or file_obj must be provided.")
 
         return chunks
     
+    def get_page_strategies(self):
+        """
+        Choose the partition strategy of each page: "hi_res" for the pages with images, tables (detected from 
+        their vector lines) or without a text layer (scanned pages), "fast" for the pages with plain text only.
+
+        Returns:
+            list: The strategy of each page.
+        """
+        strategies = []
+        for page in analyze_pdf_pages(pdf_path=self.pdf_path, file_obj=self.file_obj):
+            needs_layout = (page["nb_images"] > 0 
+                            or page["nb_lines"] >= MIN_TABLE_LINES 
+                            or page["nb_chars"] < MIN_TEXT_LAYER_CHARS)
+            strategies.append("hi_res" if needs_layout else "fast")
+        return strategies
+
+    def get_page_ranges(self):
+        """
+        Group the pages into ranges of consecutive pages partitioned with the same strategy.
+        When partitioning in parallel, the hi_res ranges are limited to pages_per_split pages.
+
+        Returns:
+            list: List of tuples (first_page, last_page, strategy) (1-indexed, inclusive).
+        """
+        if self.strategy == "auto":
+            strategies = self.get_page_strategies()
+        else:
+            strategies = [self.strategy] * count_pdf_pages(pdf_path=self.pdf_path, file_obj=self.file_obj)
+
+        max_pages = self.pages_per_split if self.nb_workers > 1 else len(strategies)
+        ranges = []
+        for page_number, strategy in enumerate(strategies, start=1):
+            if ranges and ranges[-1][2] == strategy and (strategy == "fast" or page_number - ranges[-1][0] < max_pages):
+                ranges[-1] = (ranges[-1][0], page_number, strategy)
+            else:
+                ranges.append((page_number, page_number, strategy))
+        return ranges
+
+    def partition_page_ranges(self):
+        """
+        Partition the PDF into elements by splitting it into page ranges, partitioned with their own strategy
+        and, if nb_workers > 1, in a pool of processes.
+
+        Returns:
+            list: List of elements of the whole PDF, in page order, with page numbers relative to the original PDF.
+        """
+        ranges = self.get_page_ranges()
+
+        elements = []
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            splits = split_pdf(tmp_dir, 
+                               pdf_path=self.pdf_path, 
+                               file_obj=self.file_obj, 
+                               page_ranges=[(first_page, last_page) for first_page, last_page, _ in ranges])
+            paths = [path for path, _ in splits]
+            first_pages = [first_page for _, first_page in splits]
+            strategies = [strategy for _, _, strategy in ranges]
+
+            if self.nb_workers > 1:
+                # Use "spawn" since forking a process which runs threads (e.g. the ingestion workers) is unsafe
+                with ProcessPoolExecutor(max_workers=self.nb_workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+                    results = executor.map(partition_pages, paths, first_pages, strategies)
+                    for i, split_elements in enumerate(results):
+                        elements.extend(split_elements)
+                        self.report_progress("partition", i + 1, len(splits) + 1)
+            else:
+                for i, (path, first_page, strategy) in enumerate(zip(paths, first_pages, strategies)):
+                    elements.extend(partition_pages(path, first_page, strategy))
+                    self.report_progress("partition", i + 1, len(splits) + 1)
+
+        return elements
+
+    def get_page_image(self, page_number):
+        """
+        Get the image of a page of the PDF (rendered at the dpi of the image profile), rendering it only the first time it is requested.
+
+        Args:
+            page_number (int): Page number (1-indexed).
+
+        Returns:
+            PILImage: The image of the page.
+        """
+        if page_number not in self.page_images:
+            pages = convert_pdf_to_images(pdf_path=self.pdf_path, 
+                                          file_obj=self.file_obj, 
+                                          dpi=self.image_profile["dpi"], 
+                                          first_page=page_number, 
+                                          last_page=page_number)
+            self.page_images[page_number] = pages[0]
+            self.report_progress("render", len(self.page_images), max(self.nb_pages_to_render, len(self.page_images)))
+        return self.page_images[page_number]
+    
+    def release_page_images(self):
+        """Release the rendered pages once the chunk images have been created."""
+        self.page_images = {}
+
     def get_image_base64(self, image_element: Image) -> str:
         """Get base64 code from image element."""
         return image_element.metadata.image_base64
     
+    def pil_image_to_bytes(self, image: PILImage) -> bytes:
+        """Encode PIL image to bytes with the image profile."""
+        return encode_image(image, self.image_profile)
+
     def pil_image_to_base64(self, image: PILImage) -> str:
         """Convert PIL image to base64 string."""
-        buffered = io.BytesIO()
-        image.save(buffered, format="PNG")
-        img_str = base64.b64encode(buffered.getvalue()).decode("utf-8")
+        img_str = base64.b64encode(self.pil_image_to_bytes(image)).decode("utf-8")
         return img_str
     
     def format_chunk(self, chunk):
@@ -164,24 +478,31 @@ class PDFChunker:
             if isinstance(element, Image):
                 b64_code = self.get_image_base64(element)
                 if b64_code:
-                    images.append(Document(page_content=b64_code, metadata={"type": "image"}))
+                    mime_type = element.metadata.image_mime_type or "image/jpeg"
+                    if self.llm_image_profile is not None:
+                        # Re-encode the image for the LLM to reduce the payload and the number of vision tokens
+                        llm_img = encode_image(PILImage.open(io.BytesIO(base64.b64decode(b64_code))), self.llm_image_profile)
+                        b64_code = base64.b64encode(llm_img).decode("utf-8")
+                        mime_type = get_image_mime_type(llm_img)
+                    images.append(Document(page_content=b64_code, metadata={"type": "image", "mime_type": mime_type}))
                 continue
             if isinstance(element, Table):
-                texts.append(Document(page_content=element.metadata.text_as_html, metadata={"type": "text"}))
+                # Tables partitioned with the fast strategy have no HTML representation
+                texts.append(Document(page_content=element.metadata.text_as_html or element.text, metadata={"type": "text"}))
                 continue
             if hasattr(element, "text"):
                 texts.append(Document(page_content=element.text.strip(), metadata={"type": "text"}))
                  
         return texts + images
     
-    def highlight_chunk_on_page(self, chunk, scale_x=1.0, scale_y=1.0, combined=True):
+    def highlight_chunk_on_page(self, chunk, scale_x=None, scale_y=None, combined=True):
         """
         Draw red boxes on the pdf pages around all elements in the chunk.
         
         Args:
             chunk (Document): The chunk to highlight.
-            scale_x (float): Scale factor for x-coordinates.
-            scale_y (float): Scale factor for y-coordinates.
+            scale_x (float): Scale factor for x-coordinates. If None, scale to the dpi of the image profile.
+            scale_y (float): Scale factor for y-coordinates. If None, scale to the dpi of the image profile.
             combined (bool): If True, combine all pdf pages into one image.
             
         
@@ -189,10 +510,12 @@ class PDFChunker:
             PILImage: The image with highlighted elements or a list of images if combined is False.
         """
 
+        scale_x = self.render_scale if scale_x is None else scale_x
+        scale_y = self.render_scale if scale_y is None else scale_y
+
         imgs = []
         current_page_number = chunk.metadata.page_number
-        pages = convert_pdf_to_images(pdf_path=self.pdf_path, file_obj=self.file_obj)
-        page_image = pages[current_page_number - 1]
+        page_image = self.get_page_image(current_page_number)
         img = page_image.copy()
         draw = ImageDraw.Draw(img)
 
@@ -202,7 +525,7 @@ class PDFChunker:
             if el.metadata.page_number != current_page_number:
                 imgs.append(img)
                 current_page_number = el.metadata.page_number
-                page_image = pages[current_page_number - 1]
+                page_image = self.get_page_image(current_page_number)
                 img = page_image.copy()
                 draw = ImageDraw.Draw(img)
                 
@@ -224,25 +547,27 @@ class PDFChunker:
         
         return imgs
     
-    def crop_chunk_on_page(self, chunk, scale_x=1.0, scale_y=1.0, combined=True):
+    def crop_chunk_on_page(self, chunk, scale_x=None, scale_y=None, combined=True):
         """
         Crop the chunk from the page.
         
         Args:
             chunk (Document): The chunk to crop.
-            scale_x (float): Scale factor for x-coordinates.
-            scale_y (float): Scale factor for y-coordinates.
+            scale_x (float): Scale factor for x-coordinates. If None, scale to the dpi of the image profile.
+            scale_y (float): Scale factor for y-coordinates. If None, scale to the dpi of the image profile.
             combined (bool): If True, combine all pdf pages into one image.
         
         Returns:
             PILImage: The cropped image of the chunk or a list of cropped images if combined is False.
         """
 
+        scale_x = self.render_scale if scale_x is None else scale_x
+        scale_y = self.render_scale if scale_y is None else scale_y
+
         imgs = []
         current_page_number = chunk.metadata.page_number
-        pages = convert_pdf_to_images(pdf_path=self.pdf_path, file_obj=self.file_obj)
-        page_image = pages[current_page_number - 1]
-        img = page_image.copy()
+        # No copy needed here since cropping does not modify the cached page
+        img = self.get_page_image(current_page_number)
 
         x0, y0, x1, y1 = [], [], [], []
 
@@ -257,8 +582,7 @@ class PDFChunker:
 
                 # Reset for the new page
                 current_page_number = el_page_number
-                page_image = pages[current_page_number - 1]
-                img = page_image.copy()
+                img = self.get_page_image(current_page_number)
                 x0, y0, x1, y1 = [], [], [], []
 
             coords = el.metadata.coordinates.points
@@ -306,10 +630,23 @@ class PDFChunker:
 
         return combined
 
-    def save_chunks(self, path):
+    def save_chunks(self, path, binary=None):
         """
-        Save formatted chunks and chunk images (as base64) to a JSON file.
+        Save formatted chunks and chunk images to a file, either a JSON file with the images as base64
+        or a binary chunk store (see scripts/chunk_store.py) with the raw images.
+
+        Args:
+            path (str): Path of the file.
+            binary (bool): If True, write a binary chunk store. By default, a binary chunk store is written 
+                unless the path ends with ".json".
         """
+        if binary is None:
+            binary = not path.endswith(".json")
+
+        if binary:
+            write_chunk_store(path, self.formated_chunks, self.chunks_img_bytes)
+            return
+
         data = []
         for chunk, img_b64 in zip(self.formated_chunks, self.chunks_img_b64):
             chunk_data = []
@@ -327,21 +664,42 @@ class PDFChunker:
 
     def load_chunks(self, path):
         """
-        Load formatted chunks and chunk images (as base64) from a JSON file.
-        Returns: (formated_chunks, chunks_img, chunks_img_b64)
+        Load formatted chunks and chunk images (as raw bytes) from a JSON file or a binary chunk store.
+        A binary chunk store is memory-mapped: its chunks are read lazily and its images are not copied.
+        Returns: (formated_chunks, chunks_img_bytes), as read-only sequences for a chunk store
         """
+        if is_chunk_store(path):
+            # Only the header is read here, each chunk is read from the mapped file when accessed
+            self.chunk_store = ChunkStore(path)
+            return self.chunk_store.formated_chunks, self.chunk_store.images
+
         with open(path, "r", encoding="utf-8") as f:
             data = json.load(f)
         formated_chunks = []
-        chunks_img_b64 = []
-        chunks_img = []
+        chunks_img_bytes = []
         for entry in data:
             chunk_docs = []
             for doc in entry["formated_chunk"]:
                 chunk_docs.append(Document(page_content=doc["page_content"], metadata=doc["metadata"]))
             formated_chunks.append(chunk_docs)
             img_b64 = entry["chunk_img_b64"]
-            chunks_img_b64.append(img_b64)
+            chunks_img_bytes.append(base64.b64decode(img_b64))
+
+        return formated_chunks, chunks_img_bytes
 
-        return formated_chunks, chunks_img_b64
+    def close(self):
+        """Unmap the chunk store the chunks were loaded from, if any (the loaded chunks can no longer be read)."""
+        if self.chunk_store is not None:
+            self.chunk_store.close()
+
+    def get_chunk_image_bytes(self, i):
+        """
+        Get the raw (encoded) image bytes of a chunk.
 
+        Args:
+            i (int): Index of the chunk.
+
+        Returns:
+            bytes: The image bytes (a memoryview on the mapped file if the chunks were loaded from a chunk store).
+        """
+        return self.chunks_img_bytes[i]
@@ -0,0 +1,245 @@
+import os
+import sys
+import json
+import mmap
+import struct
+import base64
+import argparse
+
+sys.path.append(os.path.abspath(os.path.join(os.getcwd(), '..')))
+
+from langchain_core.documents import Document
+
+##########################################################
+# Binary chunk store:                                    #
+#   MAGIC (8 bytes) | number of chunks (uint64, LE)      #
+#   offset table: per chunk, (record offset, record      #
+#     length, image offset, image length) (uint64, LE)   #
+#   data section: per chunk, the record (JSON documents, #
+#     the image documents point to their blob by offset  #
+#     from the end of the record), the raw images of the #
+#     image documents and the raw chunk image            #
+# Offsets are relative to the start of the data section. #
+##########################################################
+
+MAGIC = b"CHNKSTR2"
+CHUNK_STORE_VERSION = MAGIC.decode("ascii") # Part of the chunk cache key, so that stores of older versions are misses
+HEADER = struct.Struct("<8sQ")
+ENTRY = struct.Struct("<QQQQ")
+
+
+class ChunkStoreClosedError(ValueError):
+    """Raised when a chunk is read from a chunk store which has been closed."""
+
+
+def is_chunk_store(path):
+    """
+    Check if a file is a binary chunk store (and not a JSON file).
+
+    Args:
+        path (str): Path to the file.
+
+    Returns:
+        bool: True if the file starts with the chunk store magic bytes.
+    """
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def write_chunk_store(path, formated_chunks, images):
+    """
+    Write formatted chunks and their images to a binary chunk store. The images of the image documents 
+    (base64 in the formatted chunks) are stored as raw bytes in the data section, like the chunk images.
+
+    Args:
+        path (str): Path of the chunk store.
+        formated_chunks (list): List of formatted chunks (list of Document).
+        images (list): List of the raw (encoded) image bytes of each chunk.
+    """
+    entries = []
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(formated_chunks)))
+        # The offset table is written once the data section is
+        table_start = f.tell()
+        f.write(b"\0" * ENTRY.size * len(formated_chunks))
+        data_start = f.tell()
+
+        for chunk, img in zip(formated_chunks, images):
+            record, blobs, blob_offset = [], [], 0
+            for doc in chunk:
+                if doc.metadata.get("type") == "image":
+                    blob = base64.b64decode(doc.page_content)
+                    record.append({"metadata": doc.metadata, "blob_offset": blob_offset, "blob_length": len(blob)})
+                    blobs.append(blob)
+                    blob_offset += len(blob)
+                else:
+                    record.append({"page_content": doc.page_content, "metadata": doc.metadata})
+            record_bytes = json.dumps(record, ensure_ascii=False).encode("utf-8")
+
+            offset = f.tell() - data_start
+            f.write(record_bytes)
+            for blob in blobs:
+                f.write(blob)
+            f.write(img)
+            entries.append((offset, len(record_bytes), offset + len(record_bytes) + blob_offset, len(img)))
+
+        f.seek(table_start)
+        for entry in entries:
+            f.write(ENTRY.pack(*entry))
+
+
+class LazySequence:
+    """Read-only sequence whose items are computed when accessed (e.g. read from a chunk store)."""
+    def __init__(self, get_item, get_length):
+        self.get_item = get_item
+        self.get_length = get_length
+
+    def __len__(self):
+        return self.get_length()
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("chunk index out of range")
+        return self.get_item(i)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+class ChunkStore:
+    """
+    Read-only view of a binary chunk store, memory-mapped so that images are sliced without being copied.
+    Opening a store only reads its header, the chunks are read when accessed. The file stays mapped until
+    close() is called (or the store is used as a context manager).
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self.nb_chunks = HEADER.unpack_from(self.mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a chunk store.")
+
+        self.data_start = HEADER.size + ENTRY.size * self.nb_chunks
+        self.view = memoryview(self.mmap)
+        self.formated_chunks = LazySequence(self.get_formated_chunk, lambda: self.nb_chunks)
+        self.images = LazySequence(self.get_image, lambda: self.nb_chunks)
+
+    def __len__(self):
+        return self.nb_chunks
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def closed(self):
+        return self.mmap is None
+
+    def close(self):
+        """
+        Unmap the file. The chunks can no longer be read, and the file can be replaced or deleted.
+        If images returned by get_image are still referenced, the file is unmapped once they are released.
+        """
+        if self.mmap is None:
+            return
+        # Marked as closed first, so that the readers of other threads raise ChunkStoreClosedError
+        view, mm = self.view, self.mmap
+        self.view, self.mmap = None, None
+        view.release()
+        try:
+            mm.close()
+        except BufferError:
+            # Exported slices are still alive, the mmap is closed when the last of them is garbage collected
+            pass
+
+    def get_entry(self, i):
+        """Get (record offset, record length, image offset, image length) of the chunk at index i."""
+        if not 0 <= i < self.nb_chunks:
+            raise IndexError("chunk index out of range")
+        # Local reference, the store may be closed by another thread while the entry is read
+        view = self.view
+        if view is None:
+            raise ChunkStoreClosedError(f"{self.path} is closed.")
+        try:
+            return ENTRY.unpack_from(view, HEADER.size + ENTRY.size * i)
+        except ValueError as e:
+            raise ChunkStoreClosedError(f"{self.path} is closed.") from e
+
+    def get_blob(self, offset, length):
+        """Get a blob of the data section as a memoryview on the mapped file (no copy)."""
+        start = self.data_start + offset
+        view = self.view
+        if view is None:
+            raise ChunkStoreClosedError(f"{self.path} is closed.")
+        try:
+            return view[start:start + length]
+        except ValueError as e:
+            raise ChunkStoreClosedError(f"{self.path} is closed.") from e
+
+    def get_formated_chunk(self, i):
+        """Get the formatted chunk (list of Document) at index i, with the images of the image documents as base64."""
+        record_offset, record_length, _, _ = self.get_entry(i)
+        blobs_offset = record_offset + record_length
+        docs = []
+        for doc in json.loads(bytes(self.get_blob(record_offset, record_length)).decode("utf-8")):
+            if "blob_offset" in doc:
+                blob = self.get_blob(blobs_offset + doc["blob_offset"], doc["blob_length"])
+                page_content = base64.b64encode(blob).decode("utf-8")
+            else:
+                page_content = doc["page_content"]
+            docs.append(Document(page_content=page_content, metadata=doc["metadata"]))
+        return docs
+
+    def get_image(self, i):
+        """Get the raw image bytes of the chunk at index i as a memoryview on the mapped file (no copy)."""
+        _, _, img_offset, img_length = self.get_entry(i)
+        return self.get_blob(img_offset, img_length)
+
+
+class Base64Images(LazySequence):
+    """Read-only view of a sequence of raw images (e.g. from a chunk store), base64-encoded when accessed."""
+    def __init__(self, images):
+        self.images = images
+        super().__init__(lambda i: base64.b64encode(self.images[i]).decode("utf-8"), lambda: len(self.images))
+
+
+def convert_json_to_store(json_path, store_path):
+    """
+    Convert a JSON chunks file (see PDFChunker.save_chunks) to a binary chunk store.
+
+    Args:
+        json_path (str): Path to the JSON chunks file.
+        store_path (str): Path of the chunk store to write.
+    """
+    with open(json_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    formated_chunks = [
+        [Document(page_content=doc["page_content"], metadata=doc["metadata"]) for doc in entry["formated_chunk"]]
+        for entry in data
+    ]
+    images = [base64.b64decode(entry["chunk_img_b64"]) for entry in data]
+    write_chunk_store(store_path, formated_chunks, images)
+
+    print(f"Chunk store saved to {store_path} ({os.path.getsize(json_path)} -> {os.path.getsize(store_path)} bytes).")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Convert a JSON chunks file to a binary chunk store')
+
+    parser.add_argument('json_path', type=str, help='Path to the JSON chunks file')
+    parser.add_argument('--output', type=str, default=None, help='Path of the chunk store (default: same path with .chunks extension)')
+
+    args = parser.parse_args()
+
+    output = args.output or os.path.splitext(args.json_path)[0] + ".chunks"
+    convert_json_to_store(args.json_path, output)
@@ -0,0 +1,168 @@
+import os
+import threading
+from typing import Any, List
+
+import numpy as np
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.preprocessing import normalize
+from langchain_core.embeddings import Embeddings
+from langchain_openai import OpenAIEmbeddings
+from semantic_router.encoders import BaseEncoder, OpenAIEncoder
+from dotenv import load_dotenv
+
+from scripts.cache import EmbeddingCache
+
+load_dotenv()
+
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "openai") # Backend of the chunkers: "openai" or "hashing" (local, offline)
+# Backend of the retrievers and of the knowledge graph, which must be the one of the embeddings stored in the graph:
+# it does not follow EMBEDDING_BACKEND, so that chunking can be made local without mixing embedding spaces
+RETRIEVAL_EMBEDDING_BACKEND = os.getenv("RETRIEVAL_EMBEDDING_BACKEND", "openai")
+HASHING_EMBEDDING_DIM = int(os.getenv("HASHING_EMBEDDING_DIM", 1536)) # Same size as the OpenAI embeddings by default
+LOCAL_SCORE_THRESHOLD = 0.3 # Default similarity threshold of the StatisticalChunker for the local backends
+
+# Process-wide registry of the embedding clients, shared by all the requests so that
+# their HTTP connection pools are reused instead of being created for each chunker
+_ENCODERS = {}
+_ENCODERS_LOCK = threading.RLock() # Reentrant: a factory may get another shared object (e.g. the cache)
+
+
+def get_or_create(key, factory):
+    """
+    Get an encoder from the registry, creating it on first use.
+
+    Args:
+        key (tuple): Key of the encoder in the registry.
+        factory (callable): Function creating the encoder.
+
+    Returns:
+        The shared encoder.
+    """
+    encoder = _ENCODERS.get(key)
+    if encoder is None:
+        with _ENCODERS_LOCK:
+            encoder = _ENCODERS.get(key)
+            if encoder is None:
+                encoder = factory()
+                _ENCODERS[key] = encoder
+    return encoder
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Local CPU embeddings: hashed bag of words and bigrams with sublinear term frequency, L2-normalized.
+    Much weaker than a neural model, but deterministic, instantaneous and usable without network.
+    """
+    def __init__(self, dim=HASHING_EMBEDDING_DIM):
+        self.model = f"hashing-{dim}"
+        self.vectorizer = HashingVectorizer(n_features=dim, ngram_range=(1, 2), alternate_sign=False, norm=None, dtype=np.float32)
+
+    def embed_documents(self, texts):
+        counts = self.vectorizer.transform(texts)
+        counts.data = np.log1p(counts.data)
+        return normalize(counts).toarray().tolist()
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+class EmbeddingsEncoder(BaseEncoder):
+    """semantic_router encoder backed by langchain embeddings, to use a local backend with the StatisticalChunker."""
+    embeddings: Any
+
+    def __call__(self, docs: List[Any]) -> List[List[float]]:
+        return self.embeddings.embed_documents(docs)
+
+
+# Factories of the embedding backends, from the name of the model (None for the default model)
+EMBEDDING_BACKENDS = {
+    "openai": lambda model: OpenAIEmbeddings(api_key=OPENAI_API_KEY, **({"model": model} if model else {})),
+    "hashing": lambda model: HashingEmbeddings(),
+}
+REMOTE_BACKENDS = {"openai"} # Only the embeddings of remote backends are worth caching
+
+
+def get_backend(backend=None):
+    """Get the name of an embedding backend, checking that it exists (None for the configured backend)."""
+    backend = backend or EMBEDDING_BACKEND
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{backend}', expected one of {list(EMBEDDING_BACKENDS)}.")
+    return backend
+
+
+class CachedEmbeddings(Embeddings):
+    """Langchain embeddings wrapper which serves the embeddings of already seen texts from an EmbeddingCache."""
+    def __init__(self, embeddings, cache):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model = embeddings.model
+
+    def embed_documents(self, texts):
+        return self.cache.embed(texts, self.embeddings.embed_documents, model=self.model)
+
+    def embed_query(self, text):
+        return self.cache.embed([text], self.embeddings.embed_documents, model=self.model)[0]
+
+
+class CachedEncoder(BaseEncoder):
+    """semantic_router encoder wrapper which serves the embeddings of already seen texts from an EmbeddingCache."""
+    encoder: Any
+    cache: Any
+
+    def __call__(self, docs: List[Any]) -> List[List[float]]:
+        return self.cache.embed(docs, self.encoder, model=self.name)
+
+
+def get_embedding_cache():
+    """Get the shared embedding cache, created on first use."""
+    return get_or_create(("cache",), EmbeddingCache)
+
+
+def get_embedding_model(model=None, cached=False, backend=None):
+    """
+    Get the shared langchain embedding model of a backend.
+
+    Args:
+        model (str): Name of the OpenAI embedding model. If None, use the langchain default.
+        cached (bool): If True, wrap the model of a remote backend with the shared embedding cache.
+        backend (str): Name of the embedding backend. If None, use EMBEDDING_BACKEND.
+
+    Returns:
+        Embeddings: The shared embedding model.
+    """
+    backend = get_backend(backend)
+    embeddings = get_or_create(("langchain", backend, model), lambda: EMBEDDING_BACKENDS[backend](model))
+    if cached and backend in REMOTE_BACKENDS:
+        return get_or_create(("langchain_cached", backend, model), lambda: CachedEmbeddings(embeddings, get_embedding_cache()))
+    return embeddings
+
+
+def get_encoder_model(name="text-embedding-3-small", cached=False, backend=None):
+    """
+    Get the shared semantic_router encoder of a backend (used by the StatisticalChunker).
+
+    Args:
+        name (str): Name of the OpenAI embedding model (ignored by the local backends).
+        cached (bool): If True, wrap the encoder of a remote backend with the shared embedding cache.
+        backend (str): Name of the embedding backend. If None, use EMBEDDING_BACKEND.
+
+    Returns:
+        BaseEncoder: The shared encoder.
+    """
+    backend = get_backend(backend)
+    if backend == "openai":
+        encoder = get_or_create(("semantic_router", backend, name), lambda: OpenAIEncoder(name=name))
+    else:
+        embeddings = get_embedding_model(backend=backend)
+        encoder = get_or_create(
+            ("semantic_router", backend, None),
+            lambda: EmbeddingsEncoder(name=embeddings.model, score_threshold=LOCAL_SCORE_THRESHOLD, embeddings=embeddings),
+        )
+
+    if cached and backend in REMOTE_BACKENDS:
+        return get_or_create(
+            ("semantic_router_cached", backend, name),
+            lambda: CachedEncoder(name=name, score_threshold=encoder.score_threshold, encoder=encoder, cache=get_embedding_cache()),
+        )
+    return encoder
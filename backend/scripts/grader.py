@@ -0,0 +1,181 @@
+import os
+import json
+
+import numpy as np
+
+from scripts.cache import AnswerCache, normalize_answer
+from scripts.encoders import get_embedding_model, get_backend, REMOTE_BACKENDS
+
+GRADER_EMBEDDING_BACKEND = os.getenv("GRADER_EMBEDDING_BACKEND") # Embedding backend of the similarity check (None for EMBEDDING_BACKEND)
+GRADER_EMBEDDING_MODEL = os.getenv("GRADER_EMBEDDING_MODEL", "text-embedding-3-small") # Pinned, the thresholds only hold for one model
+# Similarity thresholds calibrated on labelled answers by benchmarks/grader.py, by embedding backend and model.
+# The similarity check is disabled for the backends and models which have not been calibrated.
+GRADER_THRESHOLDS_PATH = os.getenv("GRADER_THRESHOLDS_PATH", "data/grader_thresholds.json")
+# Backend used when the configured one has not been calibrated (opt-in, its thresholds must be calibrated too)
+GRADER_FALLBACK_BACKEND = os.getenv("GRADER_FALLBACK_BACKEND", "")
+
+
+def get_thresholds_key(backend, model):
+    """
+    Get the key of the thresholds of an embedding backend and model in the thresholds file. The remote models are
+    not created to get their name, the local ones (which ignore the model argument) are named after their parameters.
+    """
+    backend = get_backend(backend)
+    if backend not in REMOTE_BACKENDS:
+        model = get_embedding_model(backend=backend).model
+    return f"{backend}/{model}"
+
+
+def load_thresholds(path, key):
+    """
+    Load the calibrated similarity thresholds of an embedding backend and model.
+
+    Returns:
+        dict: "accept", "reject" (None to never accept/reject on similarity) and "margin", or None if not calibrated.
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f).get(key)
+
+
+class AnswerGrader:
+    """
+    Class to grade short answers without the LLM judge when the verdict is clear, in tiers:
+        1. the verdict already given on the same (normalized) answer to the same question,
+        2. an exact match of the normalized answer with one of the reference answers of the question,
+        3. the similarity of the embeddings of the answer and of the reference answers, with accept/reject thresholds
+           calibrated on labelled answers for the embedding backend and model (or for GRADER_FALLBACK_BACKEND if set),
+           disabled if not calibrated.
+    Only the answers left in between are judged by the LLM (see BloomQuestionGenerator.check_answer_saq).
+    """
+    def __init__(self, cache=None, backend=GRADER_EMBEDDING_BACKEND, model=GRADER_EMBEDDING_MODEL, thresholds=None):
+        self.cache = cache or AnswerCache()
+        self.backend = backend
+        self.model = model
+        self._embeddings = None # Created on the first use of the similarity check (see embeddings)
+        # Thresholds of the similarity check (see load_thresholds), None to disable it
+        self.thresholds = thresholds if thresholds is not None else load_thresholds(GRADER_THRESHOLDS_PATH, get_thresholds_key(backend, model))
+        if self.thresholds is None and GRADER_FALLBACK_BACKEND:
+            print(f"No similarity thresholds calibrated for {get_thresholds_key(backend, model)}, "
+                  f"falling back to the {GRADER_FALLBACK_BACKEND} backend.")
+            self.backend = GRADER_FALLBACK_BACKEND
+            self.thresholds = load_thresholds(GRADER_THRESHOLDS_PATH, get_thresholds_key(self.backend, model))
+        if self.thresholds is None:
+            print(f"No similarity thresholds calibrated for {get_thresholds_key(self.backend, model)}, "
+                  "short answers are only graded from the cache and the exact matches.")
+        self.stats = {"cached": 0, "exact": 0, "similar": 0, "judged": 0}
+
+    @property
+    def embeddings(self):
+        """Shared embedding model of the similarity check, created on first use."""
+        if self._embeddings is None:
+            self._embeddings = get_embedding_model(self.model, cached=True, backend=self.backend)
+        return self._embeddings
+
+    def grade(self, question, answer, reference=None):
+        """
+        Grade a short answer if the verdict is clear.
+
+        Args:
+            question (str): The question.
+            answer (str): The answer of the learner.
+            reference (dict): "correct_answer" and "incorrect_answer" generated with the question (None if unknown).
+
+        Returns:
+            tuple: (is_correct, feedback), or None if the answer must be judged by the LLM.
+        """
+        key = self.cache.get_key(question, answer)
+        verdict = self.cache.get(key)
+        if verdict is not None:
+            self.stats["cached"] += 1
+            return verdict
+
+        if reference is None:
+            self.stats["judged"] += 1
+            return None
+
+        verdict = self.match(answer, reference)
+        if verdict is not None:
+            self.stats["exact"] += 1
+        else:
+            verdict = self.compare(answer, reference)
+            if verdict is None:
+                self.stats["judged"] += 1
+                return None
+            self.stats["similar"] += 1
+
+        self.cache.put(key, *verdict)
+        return verdict
+
+    def remember(self, question, answer, is_correct, feedback):
+        """Store the verdict of the LLM judge on an answer."""
+        self.cache.put(self.cache.get_key(question, answer), is_correct, feedback)
+
+    def get_feedback(self, is_correct, reference):
+        """Get the feedback of a verdict given without the LLM judge."""
+        return "" if is_correct else f"A correct answer would be: {reference['correct_answer']}"
+
+    def match(self, answer, reference):
+        """
+        Compare the normalized answer with the normalized reference answers.
+
+        Returns:
+            tuple: (is_correct, feedback) on a match (an empty answer is incorrect), None otherwise.
+        """
+        normalized = normalize_answer(answer)
+        if not normalized or normalized == normalize_answer(reference["incorrect_answer"]):
+            return False, self.get_feedback(False, reference)
+        if normalized == normalize_answer(reference["correct_answer"]):
+            return True, self.get_feedback(True, reference)
+        return None
+
+    def compare(self, answer, reference):
+        """
+        Compare the embedding of the answer with the embeddings of the reference answers (if thresholds are calibrated). 
+        The answer is accepted if it is close to the correct answer and clearly closer to it than to the incorrect one, 
+        and rejected if it is far from the correct answer.
+
+        Returns:
+            tuple: (is_correct, feedback) if the verdict is clear, None otherwise.
+        """
+        if self.thresholds is None:
+            return None
+        try:
+            sim_correct, sim_incorrect = get_similarities(self.embeddings, answer, reference)
+        except Exception as e:
+            print(f"Error: {e}")
+            return None
+
+        is_correct = classify_similarity(sim_correct, sim_incorrect, self.thresholds)
+        if is_correct is None:
+            return None
+        return is_correct, self.get_feedback(is_correct, reference)
+
+
+def get_similarities(embeddings, answer, reference):
+    """
+    Get the cosine similarities of the embedding of an answer with the embeddings of the reference answers.
+
+    Returns:
+        tuple: (similarity to the correct answer, similarity to the incorrect answer).
+    """
+    vectors = np.array(embeddings.embed_documents([answer, reference["correct_answer"], reference["incorrect_answer"]]), dtype=np.float32)
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    sim_correct, sim_incorrect = vectors[1:] @ vectors[0]
+    return float(sim_correct), float(sim_incorrect)
+
+
+def classify_similarity(sim_correct, sim_incorrect, thresholds):
+    """
+    Classify an answer from its similarities to the reference answers.
+
+    Returns:
+        bool: True to accept, False to reject, None if the answer must be judged by the LLM.
+    """
+    accept, reject, margin = thresholds["accept"], thresholds["reject"], thresholds["margin"]
+    if accept is not None and sim_correct >= accept and sim_correct - sim_incorrect >= margin:
+        return True
+    if reject is not None and sim_correct <= reject:
+        return False
+    return None
@@ -0,0 +1,119 @@
+import os
+import uuid
+import time
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", 2))
+INGEST_MAX_PENDING = int(os.getenv("INGEST_MAX_PENDING", 16))
+INGEST_STAGES = ["partition", "render", "crop", "encode"]
+
+
+class QueueFullError(Exception):
+    """Raised when too many ingestion jobs are already waiting to be processed."""
+
+
+class IngestionQueue:
+    """Class to run the ingestion of uploaded files on a bounded pool of background workers."""
+    def __init__(self, max_workers=INGEST_WORKERS, max_pending=INGEST_MAX_PENDING, stages=INGEST_STAGES):
+        self.max_workers = max_workers
+        self.max_pending = max_pending # maximum number of jobs queued or running at the same time
+        self.stages = stages
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+        self.jobs = {}
+        self.lock = threading.Lock()
+
+    def submit(self, func, *args, info=None, **kwargs):
+        """
+        Submit an ingestion job to the worker pool.
+
+        Args:
+            func (callable): Function running the ingestion. It receives a `progress_callback` keyword argument
+                which must be called with (stage, done, total).
+            *args: Positional arguments passed to func.
+            info (dict): Metadata about the job returned with its status.
+            **kwargs: Keyword arguments passed to func.
+
+        Returns:
+            str: The id of the job.
+        """
+        with self.lock:
+            nb_pending = sum(1 for job in self.jobs.values() if job["status"] in ["queued", "running"])
+            if nb_pending >= self.max_pending:
+                raise QueueFullError(f"Too many ingestion jobs pending ({nb_pending}).")
+
+            job_id = str(uuid.uuid4())
+            self.jobs[job_id] = {
+                "job_id": job_id,
+                "info": info or {},
+                "status": "queued",
+                "stages": {stage: {"done": 0, "total": None} for stage in self.stages},
+                "result": None,
+                "error": None,
+                "created_at": time.time(),
+                "finished_at": None,
+            }
+
+        self.executor.submit(self._run, job_id, func, *args, **kwargs)
+        return job_id
+
+    def _run(self, job_id, func, *args, **kwargs):
+        """Run a job and store its result or error."""
+        self._set(job_id, status="running")
+        try:
+            result = func(*args, progress_callback=lambda stage, done, total: self.update_progress(job_id, stage, done, total), **kwargs)
+            self._set(job_id, status="done", result=result, finished_at=time.time())
+        except Exception as e:
+            print(f"Ingestion job {job_id} failed: {e}")
+            self._set(job_id, status="failed", error=str(e), finished_at=time.time())
+
+    def _set(self, job_id, **fields):
+        """Update the fields of a job."""
+        with self.lock:
+            self.jobs[job_id].update(fields)
+
+    def update_progress(self, job_id, stage, done, total):
+        """
+        Update the progress of a stage of a job.
+
+        Args:
+            job_id (str): The id of the job.
+            stage (str): The name of the stage.
+            done (int): Number of items processed in the stage.
+            total (int): Total number of items to process in the stage.
+        """
+        with self.lock:
+            self.jobs[job_id]["stages"][stage] = {"done": done, "total": total}
+
+    def get_status(self, job_id):
+        """
+        Get the status of a job.
+
+        Args:
+            job_id (str): The id of the job.
+
+        Returns:
+            dict: The status, metadata, per-stage progress, result and error of the job, or None if the job does not exist.
+        """
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            return {
+                "job_id": job["job_id"],
+                "info": dict(job["info"]),
+                "status": job["status"],
+                "stages": {stage: dict(progress) for stage, progress in job["stages"].items()},
+                "result": job["result"],
+                "error": job["error"],
+            }
+
+    def cleanup(self, max_age=3600):
+        """Forget the jobs which finished more than max_age seconds ago."""
+        now = time.time()
+        with self.lock:
+            for job_id in list(self.jobs):
+                finished_at = self.jobs[job_id]["finished_at"]
+                if finished_at is not None and now - finished_at > max_age:
+                    del self.jobs[job_id]
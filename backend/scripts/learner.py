@@ -1,3 +1,4 @@
+import copy
 import random
 
 QUESTION_TYPES = ["MCQ", "SAQ"]
@@ -130,6 +131,29 @@ class LearningTracker:
 
         return self.current_level
     
+    def predict_next_bloom_level(self, is_correct, level):
+        """
+        Predict the level get_next_bloom_level would return after answering a question, without changing the tracker.
+
+        Args:
+            is_correct (bool): Whether the answer to the question is correct.
+            level (int): Bloom level of the question.
+
+        Returns:
+            int: The predicted level, or None if it cannot be predicted (random strategy moving to a random level).
+        """
+        predicted = copy.copy(self)
+        predicted.logs = {"history": self.logs["history"] + [{"level": level, "is_correct": is_correct}]}
+
+        if self.strategy == "random":
+            if (predicted.current_level is None
+                    or predicted._consecutive_successes() >= self.min_success_question
+                    or predicted._consecutive_failures() >= self.max_fail_question):
+                return None
+            return predicted.current_level
+
+        return predicted.get_next_bloom_level()
+    
     def _initial_level(self):
         """Set the initial level for the different strategies."""	
         if self.init_bloom_level is not None:
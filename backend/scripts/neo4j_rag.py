@@ -1,7 +1,7 @@
 import os
 
 from langchain_community.vectorstores import Neo4jVector
-from langchain_openai import OpenAIEmbeddings
+from scripts.encoders import get_embedding_model, RETRIEVAL_EMBEDDING_BACKEND
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -9,12 +9,12 @@ load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
 class KnowledgeGraphRAG:
-    def __init__(self, url, username, password, vector_store_path="data/vector_store.pkl"):
+    def __init__(self, url, username, password, vector_store_path="data/vector_store.pkl", embedding_backend=RETRIEVAL_EMBEDDING_BACKEND):
         self.url = url
         self.username = username
         self.password = password
         self.vector_store_path = vector_store_path
-        self.embedding_model = OpenAIEmbeddings(api_key=OPENAI_API_KEY)
+        self.embedding_model = get_embedding_model(backend=embedding_backend)
         self.vector_store = self.get_vector_store()
             
     def get_vector_store(self) -> Neo4jVector:
@@ -0,0 +1,81 @@
+import os
+import asyncio
+
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "true").lower() == "true"
+PREFETCH_MAX_TASKS = int(os.getenv("PREFETCH_MAX_TASKS", 32)) # Maximum number of prefetches running at once (all sessions)
+
+
+class QuestionPrefetcher:
+    """
+    Class to speculatively generate, in the background, the questions a session may ask next.
+
+    Each session holds at most one set of prefetches (one per possible outcome of the pending answer),
+    keyed by (step, bloom level, is_retry). Taking a prefetch cancels the other ones of the session, and
+    no prefetch is started while max_tasks of them are already running.
+    """
+    def __init__(self, generate, max_tasks=PREFETCH_MAX_TASKS):
+        self.generate = generate # Coroutine function generating a question from keyword arguments
+        self.max_tasks = max_tasks
+        self.tasks = {} # session id -> {key: (question_type, task)}
+        self.stats = {"started": 0, "hits": 0, "misses": 0, "cancelled": 0, "skipped": 0}
+
+    def nb_running(self):
+        """Get the number of prefetches currently running."""
+        return sum(not task.done() for tasks in self.tasks.values() for _, task in tasks.values())
+
+    async def prefetch(self, session_id, candidates):
+        """
+        Start the prefetches of a session, replacing its previous ones. Async so that it runs on the event loop
+        (e.g. as a BackgroundTasks task) where the prefetches are created, it returns once they are started.
+
+        Args:
+            session_id (str): The id of the session.
+            candidates (list): List of tuples (key, kwargs) where key identifies the question
+                (step, bloom level, is_retry) and kwargs are the arguments of generate (with question_type).
+        """
+        self.cancel(session_id)
+
+        tasks = {}
+        for key, kwargs in candidates:
+            if key in tasks: continue
+            if self.nb_running() + len(tasks) >= self.max_tasks:
+                self.stats["skipped"] += 1
+                continue
+            task = asyncio.create_task(self.generate(**kwargs))
+            # Retrieve the exception of failed prefetches so that they are not logged as never retrieved
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            tasks[key] = (kwargs["question_type"], task)
+            self.stats["started"] += 1
+
+        if tasks:
+            self.tasks[session_id] = tasks
+
+    def take(self, session_id, key):
+        """
+        Take the prefetch of a question and cancel the other prefetches of the session.
+
+        Args:
+            session_id (str): The id of the session.
+            key (tuple): (step, bloom level, is_retry) of the question.
+
+        Returns:
+            tuple: (question_type, task) of the prefetch, or None if no usable prefetch matches.
+        """
+        tasks = self.tasks.pop(session_id, {})
+        match = tasks.pop(key, None)
+        for _, task in tasks.values():
+            if task.cancel():
+                self.stats["cancelled"] += 1
+
+        if match is None or match[1].cancelled() or (match[1].done() and match[1].exception() is not None):
+            self.stats["misses"] += 1
+            return None
+
+        self.stats["hits"] += 1
+        return match
+
+    def cancel(self, session_id):
+        """Cancel all the prefetches of a session."""
+        for _, task in self.tasks.pop(session_id, {}).values():
+            if task.cancel():
+                self.stats["cancelled"] += 1
@@ -0,0 +1,218 @@
+import os
+import sys
+import gzip
+import json
+import copy
+import random
+import asyncio
+import argparse
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from scripts.cache import get_chunk_hash, normalize_answer
+
+#########################################################
+# Question bank: questions pre-generated offline for    #
+# fixed course material (e.g. user_study/chunks.json)   #
+#   {"topic", "prompt_type",                            #
+#    "chunks": {chunk hash: {question type: {level:     #
+#        [{question, bloom_bert_level, validated}]}}}}  #
+# stored as gzipped JSON.                               #
+#########################################################
+
+QUESTION_TYPES = ["MCQ", "SAQ"]
+BLOOM_LEVELS = range(1, 7)
+
+
+class QuestionBank:
+    """Read-only question bank, from which the sessions draw pre-generated questions at zero latency."""
+    def __init__(self, path):
+        self.path = path
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            bank = json.load(f)
+        self.topic = bank["topic"]
+        self.prompt_type = bank["prompt_type"]
+        self.chunks = bank["chunks"]
+
+    def get(self, docs, question_type, level, prompt_type, topic, exclude=None):
+        """
+        Draw a question from the bank.
+
+        Args:
+            docs (list): List of documents (chunk) of the question.
+            question_type (str): Type of question ("MCQ" or "SAQ").
+            level (int): Bloom's Taxonomy level.
+            prompt_type (str): Type of prompt of the session.
+            topic (str): Topic of the session.
+            exclude (dict or str): Previous question (dict for MCQ, str for SAQ) which must not be drawn again.
+
+        Returns:
+            dict: A copy of a question of the bank (validated by the Bloom classifier if possible), or None if there is none.
+        """
+        if prompt_type != self.prompt_type or topic != self.topic:
+            return None
+
+        entries = self.chunks.get(get_chunk_hash(docs), {}).get(question_type, {}).get(str(level), [])
+        if exclude is not None:
+            excluded_text = exclude["question"] if isinstance(exclude, dict) else exclude
+            entries = [entry for entry in entries if entry["question"]["question"] != excluded_text]
+        if not entries:
+            return None
+
+        validated = [entry for entry in entries if entry["validated"]]
+        return copy.deepcopy(random.choice(validated or entries)["question"])
+
+
+def load_manifest(path):
+    """
+    Load the entries already generated from a manifest (JSON lines).
+
+    Returns:
+        dict: The entries, by (chunk hash, question type, level, variant).
+    """
+    entries = {}
+    if not os.path.exists(path):
+        return entries
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip(): continue
+            entry = json.loads(line)
+            entries[(entry["chunk_hash"], entry["question_type"], entry["level"], entry["variant"])] = entry
+    return entries
+
+
+async def generate_variants(generator, docs, chunk_hash, question_type, level, variants, existing, args, semaphore, manifest_file):
+    """
+    Generate the missing variants of a chunk, question type and level in one LLM call (as distinct candidates), 
+    validate their level with the Bloom classifier and append them to the manifest.
+
+    Args:
+        variants (list): Indices of the variants to generate.
+        existing (list): Questions (str) of the variants already generated, which must not be generated again.
+
+    Returns:
+        list: The manifest entries. Variants missing from the list (failed generation or duplicate candidates) 
+            will be retried on resume.
+    """
+    async with semaphore:
+        try:
+            candidates = await generator.agenerate_candidates(docs,
+                                                              question_type,
+                                                              level=level,
+                                                              prompt_type=args.prompt_type,
+                                                              topic=args.topic,
+                                                              different_from=existing[-1] if existing else None,
+                                                              nb_candidates=args.variants)
+
+            # Keep the distinct candidates, which differ from the existing variants
+            seen = {normalize_answer(question) for question in existing}
+            questions = []
+            for candidate in candidates:
+                normalized = normalize_answer(candidate["question"])
+                if normalized in seen: continue
+                seen.add(normalized)
+                questions.append(candidate)
+            questions = questions[:len(variants)]
+
+            predictions = await asyncio.to_thread(generator.evaluate_questions, [question["question"] for question in questions], level)
+            for i, (question_dict, (pred_level, validated)) in enumerate(zip(questions, predictions)):
+                if args.refine and pred_level is not None and not validated:
+                    question = generator.question_to_text(question_dict, question_type)
+                    questions[i] = await generator.arefine_question(question, docs, pred_level, level, question_type)
+                    predictions[i] = await asyncio.to_thread(generator.evaluate_question, questions[i]["question"], level)
+        except Exception as e:
+            print(f"Failed to generate {chunk_hash[:8]} {question_type} level {level}: {e}")
+            return []
+
+    entries = []
+    for variant, question_dict, (pred_level, validated) in zip(variants, questions, predictions):
+        if question_type == "MCQ":
+            question_dict = generator.shuffle_mcq(question_dict)
+        entry = {
+            "chunk_hash": chunk_hash,
+            "question_type": question_type,
+            "level": level,
+            "variant": variant,
+            "question": question_dict,
+            "bloom_bert_level": pred_level,
+            "validated": validated,
+        }
+        manifest_file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        entries.append(entry)
+    manifest_file.flush()
+
+    if len(entries) < len(variants):
+        print(f"Only {len(entries)}/{len(variants)} distinct variants generated for {chunk_hash[:8]} {question_type} level {level}.")
+    return entries
+
+
+def write_bank(path, entries, topic, prompt_type):
+    """Write the question bank file from the manifest entries."""
+    chunks = {}
+    for entry in entries:
+        levels = chunks.setdefault(entry["chunk_hash"], {}).setdefault(entry["question_type"], {})
+        levels.setdefault(str(entry["level"]), []).append({
+            "question": entry["question"],
+            "bloom_bert_level": entry["bloom_bert_level"],
+            "validated": entry["validated"],
+        })
+
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        json.dump({"topic": topic, "prompt_type": prompt_type, "chunks": chunks}, f, ensure_ascii=False, separators=(",", ":"))
+
+
+async def build_bank(args):
+    # Imported here so that sessions loading a QuestionBank do not need the chunking dependencies
+    from scripts.chunk import PDFChunker
+    from scripts.bloom_gen import BloomQuestionGenerator
+
+    chunks = PDFChunker(load_path=args.chunks).formated_chunks
+    generator = BloomQuestionGenerator(model=args.model)
+    manifest_path = args.manifest or f"{args.output}.manifest.jsonl"
+    done = load_manifest(manifest_path)
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    with open(manifest_path, "a", encoding="utf-8") as manifest_file:
+        tasks = []
+        nb_to_generate = 0
+        for docs in chunks:
+            chunk_hash = get_chunk_hash(docs)
+            for question_type in QUESTION_TYPES:
+                for level in BLOOM_LEVELS:
+                    keys = [(chunk_hash, question_type, level, variant) for variant in range(args.variants)]
+                    variants = [key[3] for key in keys if key not in done]
+                    if not variants: continue
+                    existing = [done[key]["question"]["question"] for key in keys if key in done]
+                    tasks.append(generate_variants(generator, docs, chunk_hash, question_type, level, variants, existing, args, semaphore, manifest_file))
+                    nb_to_generate += len(variants)
+
+        print(f"{len(done)} questions already generated, {nb_to_generate} to generate in {len(tasks)} LLM calls.")
+        results = await asyncio.gather(*tasks)
+
+    generated = [entry for entries in results for entry in entries]
+    entries = list(done.values()) + generated
+    nb_failed = nb_to_generate - len(generated)
+    nb_validated = sum(entry["validated"] for entry in entries)
+
+    write_bank(args.output, entries, args.topic, args.prompt_type)
+    print(f"Question bank saved to {args.output}: {len(entries)} questions ({nb_validated} validated by the Bloom classifier), {nb_failed} failed.")
+    if nb_failed:
+        print("Run the command again to resume the failed generations.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Pre-generate a question bank for a chunks file (every chunk x Bloom level x question type)')
+
+    parser.add_argument('chunks', type=str, help='Path to the chunks file (JSON or binary chunk store)')
+    parser.add_argument('--output', type=str, default='data/question_bank.json.gz', help='Path of the question bank file')
+    parser.add_argument('--manifest', type=str, default=None, help='Checkpoint manifest used to resume (default: <output>.manifest.jsonl)')
+    parser.add_argument('--topic', type=str, default=None, help='Topic of the course (must match the topic of the sessions)')
+    parser.add_argument('--prompt-type', type=str, default='desc', help='Type of prompt (must match the prompt type of the sessions)')
+    parser.add_argument('--variants', type=int, default=3, help='Number of questions per chunk, level and question type')
+    parser.add_argument('--concurrency', type=int, default=8, help='Maximum number of generations running at once')
+    parser.add_argument('--refine', action='store_true', help='Refine the questions not classified at the right level by the Bloom classifier')
+    parser.add_argument('--model', type=str, default='gpt-4o', help='LLM used to generate the questions')
+
+    args = parser.parse_args()
+
+    asyncio.run(build_bank(args))
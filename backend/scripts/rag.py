@@ -11,7 +11,7 @@ sys.path.append(os.path.abspath(os.path.join(os.getcwd(), '..')))
 from abc import ABC, abstractmethod
 from sklearn.metrics.pairwise import cosine_similarity
 from utils.helpers import connection
-from langchain_openai import OpenAIEmbeddings
+from scripts.encoders import get_embedding_model, RETRIEVAL_EMBEDDING_BACKEND
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -21,14 +21,14 @@ EMBEDDING_LEN = 1536
 
 class Retriever(ABC):
     """Abstract base class for document retrievers."""
-    def __init__(self, url, username, password, node_id, doc_property="documents", doc_embeddings_property="doc_embeddings"):
+    def __init__(self, url, username, password, node_id, doc_property="documents", doc_embeddings_property="doc_embeddings", embedding_backend=RETRIEVAL_EMBEDDING_BACKEND):
         self.url = url
         self.username = username
         self.password = password
         self.node_id = node_id
         self.doc_property = doc_property # Property name in the node for the list of documents
         self.doc_embeddings_property = doc_embeddings_property # Property name in the node for the list of embeddings
-        self.embedding_model = OpenAIEmbeddings(api_key=OPENAI_API_KEY)
+        self.embedding_model = get_embedding_model(backend=embedding_backend) # Must match the backend of the stored embeddings
         self.driver = connection(url, username, password)
         self.docs = self.get_documents()
         self.embeddings = self.get_embeddings()
@@ -74,8 +74,8 @@ class Retriever(ABC):
     
 
 class EuclideanRetriever(Retriever):
-    def __init__(self, url, username, password, node_id, doc_property="documents", doc_embeddings_property="doc_embeddings"):
-        super().__init__(url, username, password, node_id, doc_property, doc_embeddings_property)
+    def __init__(self, url, username, password, node_id, doc_property="documents", doc_embeddings_property="doc_embeddings", embedding_backend=RETRIEVAL_EMBEDDING_BACKEND):
+        super().__init__(url, username, password, node_id, doc_property, doc_embeddings_property, embedding_backend)
 
     def retrieve_top_k(self, query, k=1):
         """
@@ -111,8 +111,8 @@ class EuclideanRetriever(Retriever):
     
     
 class CosineRetriever(Retriever):
-    def __init__(self, url, username, password, node_id, doc_property="documents", doc_embeddings_property="doc_embeddings"):
-        super().__init__(url, username, password, node_id, doc_property, doc_embeddings_property)
+    def __init__(self, url, username, password, node_id, doc_property="documents", doc_embeddings_property="doc_embeddings", embedding_backend=RETRIEVAL_EMBEDDING_BACKEND):
+        super().__init__(url, username, password, node_id, doc_property, doc_embeddings_property, embedding_backend)
     
     def retrieve_top_k(self, query, k=1):
         """
@@ -148,8 +148,8 @@ class CosineRetriever(Retriever):
     
 
 class FaissRetriever(Retriever):
-    def __init__(self, url, username, password, node_id, doc_property="documents", doc_embeddings_property="doc_embeddings"):
-        super().__init__(url, username, password, node_id, doc_property, doc_embeddings_property)
+    def __init__(self, url, username, password, node_id, doc_property="documents", doc_embeddings_property="doc_embeddings", embedding_backend=RETRIEVAL_EMBEDDING_BACKEND):
+        super().__init__(url, username, password, node_id, doc_property, doc_embeddings_property, embedding_backend)
         self.index = faiss.IndexFlatL2(self.embeddings.shape[1])
         self.index.add(self.embeddings)
     
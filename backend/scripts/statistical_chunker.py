@@ -0,0 +1,130 @@
+import re
+
+import numpy as np
+import tiktoken
+
+SENTENCE_REGEX = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"'(\[])|\n\s*\n") # Sentence ends and blank lines
+EMBEDDING_BATCH_SIZE = 1000 # Number of sentences embedded per call to the embedding model
+
+
+class VectorizedStatisticalChunker:
+    """
+    Statistical chunker computing the split points of a whole text at once with NumPy.
+
+    The sentences are embedded in large batches, each sentence is compared with the mean embedding
+    of the window_size previous sentences, and the least similar boundaries are chosen as split
+    points so that the chunks average the middle of [min_split_tokens, max_split_tokens]. The token
+    constraints are then enforced when the sentences are grouped into chunks.
+    """
+    def __init__(self, embedding_function, window_size=5, min_split_tokens=100, max_split_tokens=300,
+                 batch_size=EMBEDDING_BATCH_SIZE, encoding_name="cl100k_base"):
+        self.embedding_function = embedding_function # Function embedding a list of texts (e.g. embed_documents)
+        self.window_size = window_size
+        self.min_split_tokens = min_split_tokens
+        self.max_split_tokens = max_split_tokens
+        self.batch_size = batch_size
+        self.tokenizer = tiktoken.get_encoding(encoding_name)
+
+    def split_sentences(self, text):
+        """Split a text in sentences."""
+        return [s.strip() for s in SENTENCE_REGEX.split(text) if s and s.strip()]
+
+    def embed(self, sentences):
+        """
+        Embed sentences in batches.
+
+        Returns:
+            np.array: L2-normalized embeddings of shape (nb_sentences, dim), float32.
+        """
+        embeddings = []
+        for i in range(0, len(sentences), self.batch_size):
+            embeddings.extend(self.embedding_function(sentences[i:i + self.batch_size]))
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return embeddings / np.maximum(norms, 1e-12)
+
+    def window_similarities(self, embeddings):
+        """
+        Compute the similarity of each sentence with the mean of the window_size previous sentences.
+
+        Args:
+            embeddings (np.array): Normalized embeddings of shape (nb_sentences, dim).
+
+        Returns:
+            np.array: Similarities of shape (nb_sentences - 1,), for the boundaries before sentences 1..n-1.
+        """
+        n = len(embeddings)
+        cumsum = np.zeros((n + 1, embeddings.shape[1]), dtype=np.float64)
+        np.cumsum(embeddings, axis=0, out=cumsum[1:])
+
+        # Window sums of the sentences [max(0, i - window_size), i) for i in 1..n-1
+        ends = np.arange(1, n)
+        starts = np.maximum(0, ends - self.window_size)
+        contexts = cumsum[ends] - cumsum[starts]
+        contexts /= np.maximum(np.linalg.norm(contexts, axis=1, keepdims=True), 1e-12)
+
+        return np.einsum("ij,ij->i", contexts, embeddings[1:])
+
+    def find_threshold(self, similarities, total_tokens):
+        """
+        Find the similarity threshold under which a boundary is a split point, such that the chunks
+        average the middle of the token constraints.
+
+        Args:
+            similarities (np.array): Similarities of the boundaries.
+            total_tokens (int): Number of tokens of the text.
+
+        Returns:
+            float: The threshold.
+        """
+        if len(similarities) == 0:
+            return -np.inf
+
+        # Number of splits of every candidate threshold (the sorted similarities), evaluated at once
+        candidates = np.sort(similarities)
+        nb_splits = np.searchsorted(candidates, candidates, side="left")
+        mean_tokens = total_tokens / (nb_splits + 1)
+        target_tokens = (self.min_split_tokens + self.max_split_tokens) / 2
+        return candidates[np.argmin(np.abs(mean_tokens - target_tokens))]
+
+    def group_sentences(self, sentences, token_counts, is_split):
+        """
+        Group sentences into chunks at the split points, under the token constraints.
+
+        Args:
+            sentences (list): List of sentences.
+            token_counts (np.array): Number of tokens of each sentence.
+            is_split (np.array): Whether the boundary before each sentence 1..n-1 is a split point.
+
+        Returns:
+            list: List of chunks (str).
+        """
+        chunks = []
+        current, current_tokens = [sentences[0]], int(token_counts[0])
+        for sentence, tokens, split in zip(sentences[1:], token_counts[1:].tolist(), is_split.tolist()):
+            if (split and current_tokens >= self.min_split_tokens) or current_tokens + tokens > self.max_split_tokens:
+                chunks.append(" ".join(current))
+                current, current_tokens = [], 0
+            current.append(sentence)
+            current_tokens += tokens
+        chunks.append(" ".join(current))
+        return chunks
+
+    def split_text(self, text):
+        """
+        Chunk a text.
+
+        Args:
+            text (str): The text to chunk.
+
+        Returns:
+            list: List of chunks (str).
+        """
+        sentences = self.split_sentences(text)
+        if len(sentences) <= 1:
+            return sentences
+
+        token_counts = np.array([len(tokens) for tokens in self.tokenizer.encode_ordinary_batch(sentences)])
+        similarities = self.window_similarities(self.embed(sentences))
+        threshold = self.find_threshold(similarities, int(token_counts.sum()))
+        return self.group_sentences(sentences, token_counts, similarities < threshold)
@@ -0,0 +1,57 @@
+import os
+import sys
+import asyncio
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault("OPENAI_API_KEY", "test") # The LLM is never called, the candidates are stubbed
+
+from fastapi import BackgroundTasks
+from langchain_core.documents import Document
+
+from scripts.bloom_gen import BloomQuestionGenerator
+from scripts.cache import QuestionCache
+from scripts.prefetch import QuestionPrefetcher
+
+QUESTION = {"question": "What does an AI agent perceive?", "correct_answer": "Its environment.", "incorrect_answer": "Nothing."}
+
+
+class StubClassifier:
+    """Bloom classifier which is never expected to be called (no refinement, a single candidate)."""
+    def classify(self, questions):
+        raise AssertionError("The classifier should not be called")
+
+
+def test_prefetch_from_background_tasks_fills_question_cache():
+    question_cache = QuestionCache(fresh_ratio=0)
+    generator = BloomQuestionGenerator(question_cache=question_cache, classifier=StubClassifier())
+    calls = []
+
+    async def agenerate_candidates(*args, **kwargs):
+        calls.append(kwargs)
+        return [dict(QUESTION)]
+    generator.agenerate_candidates = agenerate_candidates
+
+    async def generate(docs, question_type, level, topic=None, different_from=None):
+        return await generator.agenerate_question(docs, question_type, level=level, prompt_type="desc",
+                                                  topic=topic, different_from=different_from)
+
+    docs = [Document(page_content="An AI agent perceives its environment and acts on it.", metadata={})]
+    key = (1, 2, False)
+    candidates = [(key, {"docs": docs, "question_type": "SAQ", "level": 2, "topic": None, "different_from": None})]
+
+    async def run():
+        prefetcher = QuestionPrefetcher(generate)
+        # Same scheduling as the endpoints, the tasks run once the response has been sent
+        background_tasks = BackgroundTasks()
+        background_tasks.add_task(prefetcher.prefetch, "session", candidates)
+        await background_tasks()
+
+        assert prefetcher.stats["started"] == 1
+        question_type, task = prefetcher.take("session", key)
+        assert question_type == "SAQ"
+        return await task
+
+    assert asyncio.run(run()) == QUESTION
+    assert len(calls) == 1
+    cache_key = question_cache.get_key(docs, "SAQ", 2, "desc", None)
+    assert question_cache.get(cache_key) == QUESTION
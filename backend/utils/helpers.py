@@ -1,10 +1,15 @@
 import os
 import re
+import json
+import io
 import base64
 from neo4j import GraphDatabase
+from PIL import Image as PILImage
 from IPython.display import display, HTML, Image
-from PyPDF2 import PdfReader
+from PyPDF2 import PdfReader, PdfWriter
 from pdf2image import convert_from_path, convert_from_bytes
+from pdfminer.high_level import extract_pages
+from pdfminer.layout import LTContainer, LTChar, LTImage, LTRect, LTLine, LTCurve
 
 def connection(url="bolt://localhost:7687", username="neo4j", password="password123") -> GraphDatabase:
     """
@@ -123,6 +128,100 @@ def clean_pdf_text(text):
     return re.sub(r'[\x00-\x1F\x7F]', '', text)
 
 
+def repair_json(text):
+    """
+    Repair common formatting errors of JSON generated by an LLM
+
+    Args:
+        text (str): Generated JSON string
+    
+    Returns:
+        str: Repaired JSON string (to be validated by the caller), unchanged if it is already valid
+    """
+    # The repairs below may alter the content of the strings, so they are only applied to invalid JSON
+    try:
+        json.loads(text)
+        return text
+    except json.JSONDecodeError:
+        pass
+
+    # Remove the code fences (```json ... ```) and any text around the JSON object
+    text = re.sub(r'^\s*```[a-zA-Z]*\s*|\s*```\s*$', '', text)
+    start, end = text.find('{'), text.rfind('}')
+    if start != -1 and end > start:
+        text = text[start:end + 1]
+    # Add the missing commas between a value and the next key on a new line
+    text = re.sub(r'("|\d|true|false|null|\}|\])(\s*\n\s*")', r'\1,\2', text)
+    text = clean_pdf_text(text)
+    # Remove the trailing commas
+    return re.sub(r',\s*([}\]])', r'\1', text)
+
+
+def close_partial_json(text, stack, in_string):
+    """Close the open string, arrays and objects of the beginning of a JSON string (see parse_partial_json)"""
+    if in_string:
+        # Remove an unfinished escape sequence before closing the string
+        text = re.sub(r'\\(u[0-9a-fA-F]{0,3})?$', '', text) + '"'
+    text = text.rstrip()
+    if text.endswith(','):
+        text = text[:-1]
+    elif text.endswith(':'):
+        text += 'null'
+    return text + ''.join(reversed(stack))
+
+
+def parse_partial_json(text):
+    """
+    Parse the beginning of a JSON object streamed by an LLM, by closing its open string, arrays and objects
+
+    Args:
+        text (str): JSON string received so far
+
+    Returns:
+        dict: The values parsed so far (the last string value may be truncated), or None if nothing can be parsed yet
+    """
+    start = text.find('{')
+    if start == -1:
+        return None
+    text = text[start:]
+
+    stack, in_string, escaped = [], False, False
+    last_comma = None # (index, stack) of the last comma between two values, where the text can be cut
+    for i, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in '{[':
+            stack.append('}' if char == '{' else ']')
+        elif char in '}]':
+            stack.pop()
+            if not stack:
+                text = text[:i + 1]
+                break
+        elif char == ',':
+            last_comma = (i, list(stack))
+
+    candidates = [close_partial_json(text, stack, in_string)]
+    if last_comma is not None:
+        # The text may end in the middle of a key or of a literal (e.g. "tru"), drop the last value
+        candidates.append(close_partial_json(text[:last_comma[0]], last_comma[1], False))
+
+    for candidate in candidates:
+        try:
+            value = json.loads(candidate)
+        except json.JSONDecodeError:
+            continue
+        if isinstance(value, dict):
+            return value
+    return None
+
+
 def display_base64_image(base64_code):
     """
     Display a base64 encoded image in a Jupyter notebook
@@ -137,27 +236,104 @@ def display_base64_image(base64_code):
     display(Image(data=image_data))
 
 
-def convert_pdf_to_images(pdf_path=None, file_obj=None, dpi=200):
+def convert_pdf_to_images(pdf_path=None, file_obj=None, dpi=200, first_page=None, last_page=None):
     """
     Convert each page of a PDF file to an image
 
     Args:
         pdf_path (str): Path to the PDF file
+        file_obj (file-like): File object of the PDF file
         dpi (int): Resolution of the images
+        first_page (int, optional): First page to convert (1-indexed). If None, start from the first page.
+        last_page (int, optional): Last page to convert (1-indexed). If None, stop at the last page.
 
     Returns:
         list: List of images converted from the PDF 
     """
     # Convert PDF to images
     if pdf_path:
-        return convert_from_path(pdf_path, dpi=dpi)
+        return convert_from_path(pdf_path, dpi=dpi, first_page=first_page, last_page=last_page)
     elif file_obj:
         file_obj.seek(0)
-        return convert_from_bytes(file_obj.read(), dpi=dpi)
+        return convert_from_bytes(file_obj.read(), dpi=dpi, first_page=first_page, last_page=last_page)
     else:
         raise ValueError("Either pdf_path or file_obj must be provided")
 
 
+# Encoding profiles of the images: "display" for the chunk images shown to the learner,
+# "llm" for the images sent to the LLM (vision tokens grow with the image size) and "png" for lossless images
+IMAGE_PROFILES = {
+    "display": {"format": "WEBP", "quality": 80, "max_width": 1600, "max_height": 2400, "dpi": 150},
+    "llm": {"format": "JPEG", "quality": 75, "max_width": 1024, "max_height": 1024, "dpi": 150},
+    "png": {"format": "PNG", "quality": None, "max_width": None, "max_height": None, "dpi": 200},
+}
+IMAGE_MIME_TYPES = {"PNG": "image/png", "JPEG": "image/jpeg", "WEBP": "image/webp"}
+
+
+def get_image_profile(profile):
+    """
+    Get an image encoding profile
+
+    Args:
+        profile (str or dict): Name of a profile of IMAGE_PROFILES or a profile dictionary
+
+    Returns:
+        dict: The profile (format, quality, max_width, max_height, dpi)
+    """
+    if isinstance(profile, dict):
+        return {**IMAGE_PROFILES["png"], **profile}
+    if profile not in IMAGE_PROFILES:
+        raise ValueError(f"Unknown image profile: {profile}. Options are {list(IMAGE_PROFILES)}.")
+    return IMAGE_PROFILES[profile]
+
+
+def encode_image(image, profile="png"):
+    """
+    Encode a PIL image with an encoding profile
+
+    Args:
+        image (PILImage): Image to encode
+        profile (str or dict): Encoding profile (see IMAGE_PROFILES)
+
+    Returns:
+        bytes: The encoded image
+    """
+    profile = get_image_profile(profile)
+
+    # Downscale the image (keeping its aspect ratio) if it is larger than the maximum dimensions
+    max_width = profile["max_width"] or image.width
+    max_height = profile["max_height"] or image.height
+    if image.width > max_width or image.height > max_height:
+        image = image.copy()
+        image.thumbnail((max_width, max_height), PILImage.LANCZOS)
+
+    if profile["format"] == "JPEG" and image.mode != "RGB":
+        image = image.convert("RGB")
+
+    kwargs = {"quality": profile["quality"]} if profile["quality"] is not None else {}
+    buffered = io.BytesIO()
+    image.save(buffered, format=profile["format"], **kwargs)
+    return buffered.getvalue()
+
+
+def get_image_mime_type(image_bytes):
+    """
+    Get the MIME type of an encoded image from its signature
+
+    Args:
+        image_bytes (bytes): The encoded image
+
+    Returns:
+        str: The MIME type of the image (image/png by default)
+    """
+    header = bytes(image_bytes[:12])
+    if header.startswith(b"\xff\xd8"):
+        return "image/jpeg"
+    if header.startswith(b"RIFF") and header[8:12] == b"WEBP":
+        return "image/webp"
+    return "image/png"
+
+
 def get_scaled_coords(coords, scale_x=1.0, scale_y=1.0):
     """
     Scale coordinates based on the image size.
@@ -170,4 +346,105 @@ def get_scaled_coords(coords, scale_x=1.0, scale_y=1.0):
     Returns:
         list: List of scaled coordinates.
     """
-    return [(int(x * scale_x), int(y * scale_y)) for x, y in coords]
\ No newline at end of file
+    return [(int(x * scale_x), int(y * scale_y)) for x, y in coords]
+
+
+def split_pdf(output_dir, pdf_path=None, file_obj=None, pages_per_split=4, page_ranges=None):
+    """
+    Split a PDF file into several PDF files containing consecutive page ranges
+
+    Args:
+        output_dir (str): Directory where the split PDF files are written
+        pdf_path (str): Path to the PDF file
+        file_obj (file-like): File object of the PDF file
+        pages_per_split (int): Number of pages in each split (if page_ranges is None)
+        page_ranges (list, optional): List of tuples (first_page, last_page) (1-indexed, inclusive) of the splits
+
+    Returns:
+        list: List of tuples (path, first_page) where first_page is the 1-indexed page number of the first page of the split in the original PDF
+    """
+    if pdf_path:
+        reader = PdfReader(pdf_path)
+    elif file_obj:
+        file_obj.seek(0)
+        reader = PdfReader(file_obj)
+    else:
+        raise ValueError("Either pdf_path or file_obj must be provided")
+
+    if page_ranges is None:
+        nb_pages = len(reader.pages)
+        page_ranges = [(start + 1, min(start + pages_per_split, nb_pages)) for start in range(0, nb_pages, pages_per_split)]
+
+    splits = []
+    for first_page, last_page in page_ranges:
+        start = first_page - 1
+        writer = PdfWriter()
+        for page in reader.pages[start:last_page]:
+            writer.add_page(page)
+
+        path = os.path.join(output_dir, f"pages_{start + 1}.pdf")
+        with open(path, "wb") as f:
+            writer.write(f)
+        splits.append((path, start + 1))
+
+    return splits
+
+
+def count_pdf_pages(pdf_path=None, file_obj=None):
+    """
+    Count the pages of a PDF file
+
+    Args:
+        pdf_path (str): Path to the PDF file
+        file_obj (file-like): File object of the PDF file
+
+    Returns:
+        int: Number of pages
+    """
+    if pdf_path:
+        return len(PdfReader(pdf_path).pages)
+    elif file_obj:
+        file_obj.seek(0)
+        return len(PdfReader(file_obj).pages)
+    else:
+        raise ValueError("Either pdf_path or file_obj must be provided")
+
+
+def analyze_pdf_pages(pdf_path=None, file_obj=None):
+    """
+    Inspect the objects of each page of a PDF file (without layout analysis) to find out 
+    whether the page has a text layer, images or vector graphics such as table borders
+
+    Args:
+        pdf_path (str): Path to the PDF file
+        file_obj (file-like): File object of the PDF file
+
+    Returns:
+        list: List of dictionaries (one per page) with the number of characters, images and lines (rectangles, lines and curves)
+    """
+    if pdf_path:
+        source = pdf_path
+    elif file_obj:
+        file_obj.seek(0)
+        source = file_obj
+    else:
+        raise ValueError("Either pdf_path or file_obj must be provided")
+
+    pages = []
+    for page_layout in extract_pages(source, laparams=None):
+        info = {"nb_chars": 0, "nb_images": 0, "nb_lines": 0}
+        objects = list(page_layout)
+        while objects:
+            obj = objects.pop()
+            if isinstance(obj, LTChar):
+                if not obj.get_text().isspace():
+                    info["nb_chars"] += 1
+            elif isinstance(obj, LTImage):
+                info["nb_images"] += 1
+            elif isinstance(obj, (LTRect, LTLine, LTCurve)):
+                info["nb_lines"] += 1
+            elif isinstance(obj, LTContainer):
+                objects.extend(obj)
+        pages.append(info)
+
+    return pages
@@ -1,4 +1,4 @@
-def create_prompt(docs, question_type, level, prompt_type="basic", topic=None, different_from=None):
+def create_prompt(docs, question_type, level, prompt_type="basic", topic=None, different_from=None, nb_candidates=1):
     """
     Construct the prompt for the LLM to generate a question based on Bloom's Taxonomy.
 
@@ -8,6 +8,7 @@ def create_prompt(docs, question_type, level, prompt_type="basic", topic=None, d
         level (str): Bloom's Taxonomy level for cognitive complexity.
         prompt_type (str): Type of prompt to use, e.g., basic or description.
         different_from (str): A question that the generated question should be different from.
+        nb_candidates (int): Number of candidate questions to generate in the response.
 
     Returns:
         tuple: System and user prompts
@@ -16,7 +17,7 @@ def create_prompt(docs, question_type, level, prompt_type="basic", topic=None, d
     assert question_type in ["MCQ", "SAQ"], "Invalid question type. Options are 'MCQ' or 'SAQ'."
 
     task_prompt = get_task_prompt(question_type)
-    output_format_prompt = get_output_format(question_type)
+    output_format_prompt = get_output_format(question_type, nb_candidates)
 
     system_prompt = "You are a highly skilled AI tutor specializing in education and Bloom's Taxonomy."
 
@@ -104,7 +105,7 @@ def create_prompt(docs, question_type, level, prompt_type="basic", topic=None, d
             prompt_content.append(
                 {
                     "type": "image_url",
-                    "image_url": {"url": f"data:image/jpeg;base64,{img.page_content}"},
+                    "image_url": {"url": f"data:{img.metadata.get('mime_type', 'image/jpeg')};base64,{img.page_content}"},
                 }
             )
 
@@ -164,7 +165,7 @@ def create_refine_prompt(docs, question, question_type, gt_level, pred_level):
             prompt_content.append(
                 {
                     "type": "image_url",
-                    "image_url": {"url": f"data:image/jpeg;base64,{img.page_content}"},
+                    "image_url": {"url": f"data:{img.metadata.get('mime_type', 'image/jpeg')};base64,{img.page_content}"},
                 }
             )
 
@@ -215,7 +216,7 @@ def create_judge_prompt(docs, question, answer):
             prompt_content.append(
                 {
                     "type": "image_url",
-                    "image_url": {"url": f"data:image/jpeg;base64,{img.page_content}"},
+                    "image_url": {"url": f"data:{img.metadata.get('mime_type', 'image/jpeg')};base64,{img.page_content}"},
                 }
             )
 
@@ -246,12 +247,14 @@ def get_task_prompt(question_type):
     return prompt
 
 
-def get_output_format(question_type):
+def get_output_format(question_type, nb_candidates=1):
     """
     Get the output format based on the question type.
 
     Args:
         question_type (str): Type of question to generate, e.g., multiple-choice (MCQ), short answer (SAQ).
+        nb_candidates (int): Number of candidate questions in the output. If greater than 1, the output 
+            is a list of candidates in the format of a single question.
 
     Returns:
         str: The output format for the specified question type.
@@ -259,7 +262,6 @@ def get_output_format(question_type):
 
     if question_type == "MCQ":
         prompt = (
-            "Respond ONLY with a valid JSON object. DO NOT wrap the JSON in triple backticks or any other formatting. The JSON must contain: \n"  
             "{\n"
             "  \"question\": \"<full text question>\",\n"
             "  \"choices\": {\n"
@@ -274,15 +276,99 @@ def get_output_format(question_type):
         
     elif question_type == "SAQ":
         prompt = (
-            "Respond ONLY with a valid JSON object. DO NOT wrap the JSON in triple backticks or any other formatting. The JSON must contain: \n" 
             "{\n"
             "  \"question\": \"<full text question>\",\n"
             "  \"correct_answer\": \"<a possible correct answer>\"\n"
             "  \"incorrect_answer\": \"<a possible incorrect answer>\"\n"
             "}"
         )
-    
-    return prompt
+
+    if nb_candidates > 1:
+        return (
+            f"Generate {nb_candidates} different candidate questions, all at the requested Bloom's Taxonomy level. "
+            "Respond ONLY with a valid JSON object. DO NOT wrap the JSON in triple backticks or any other formatting. The JSON must contain: \n"
+            "{\n"
+            "  \"candidates\": [<candidate 1>, <candidate 2>, ...]\n"
+            "}\n"
+            f"where \"candidates\" is a list of {nb_candidates} objects, each of them containing: \n"
+            f"{prompt}"
+        )
+
+    return (
+        "Respond ONLY with a valid JSON object. DO NOT wrap the JSON in triple backticks or any other formatting. The JSON must contain: \n"
+        f"{prompt}"
+    )
+
+
+def get_output_schema(question_type, nb_candidates=1):
+    """
+    Get the JSON schema of the output (for the structured output mode of the LLM), matching get_output_format.
+
+    Args:
+        question_type (str): Type of question to generate, e.g., multiple-choice (MCQ), short answer (SAQ).
+        nb_candidates (int): Number of candidate questions in the output.
+
+    Returns:
+        dict: The JSON schema for the specified question type.
+    """
+
+    if question_type == "MCQ":
+        schema = {
+            "type": "object",
+            "properties": {
+                "question": {"type": "string"},
+                "choices": {
+                    "type": "object",
+                    "properties": {letter: {"type": "string"} for letter in ["A", "B", "C", "D"]},
+                    "required": ["A", "B", "C", "D"],
+                    "additionalProperties": False,
+                },
+                "answer": {"type": "string", "enum": ["A", "B", "C", "D"]},
+            },
+            "required": ["question", "choices", "answer"],
+            "additionalProperties": False,
+        }
+
+    elif question_type == "SAQ":
+        schema = {
+            "type": "object",
+            "properties": {
+                "question": {"type": "string"},
+                "correct_answer": {"type": "string"},
+                "incorrect_answer": {"type": "string"},
+            },
+            "required": ["question", "correct_answer", "incorrect_answer"],
+            "additionalProperties": False,
+        }
+
+    if nb_candidates > 1:
+        return {
+            "type": "object",
+            "properties": {"candidates": {"type": "array", "items": schema}},
+            "required": ["candidates"],
+            "additionalProperties": False,
+        }
+
+    return schema
+
+
+def get_judge_schema():
+    """
+    Get the JSON schema of the output of the judge (see create_judge_prompt).
+
+    Returns:
+        dict: The JSON schema of the correction.
+    """
+
+    return {
+        "type": "object",
+        "properties": {
+            "is_correct": {"type": "boolean"},
+            "feedback": {"type": "string"},
+        },
+        "required": ["is_correct", "feedback"],
+        "additionalProperties": False,
+    }
 
 
 def get_bloom_level_prompt(level):
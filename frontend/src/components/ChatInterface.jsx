@@ -3,12 +3,60 @@ import ProgressBar from './ProgressBar' // Import the ProgressBar component
 import EmojiFeedback from './EmojiFeedback'
 
 const BACKEND_URL = import.meta.env.VITE_BACKEND_URL;
+const CHUNK_RETRY_INTERVAL = 1000 // Interval (ms) before asking again for a chunk which is still being processed
+
+// Fetch the current chunk and question, waiting while the chunk is still being processed by the backend
+const fetchChunk = async (sessionId) => {
+  while (true) {
+    const res = await fetch(`${BACKEND_URL}/chunk/${sessionId}`)
+    if (res.status !== 202) return res.json()
+    await new Promise((resolve) => setTimeout(resolve, CHUNK_RETRY_INTERVAL))
+  }
+}
+
+// Stream the current chunk and question (server-sent events): onEvent is called with "chunk", "question_delta" 
+// (stem of the question generated so far), "question" and "error" events
+const streamChunk = async (sessionId, onEvent) => {
+  let res
+  while (true) {
+    res = await fetch(`${BACKEND_URL}/chunk/${sessionId}/stream`)
+    if (res.status !== 202) break
+    await new Promise((resolve) => setTimeout(resolve, CHUNK_RETRY_INTERVAL))
+  }
+  if (!res.ok) {
+    onEvent('error', await res.json())
+    return
+  }
+
+  const reader = res.body.getReader()
+  const decoder = new TextDecoder()
+  let buffer = ''
+  while (true) {
+    const { done, value } = await reader.read()
+    if (done) break
+    buffer += decoder.decode(value, { stream: true })
+
+    // Events are separated by a blank line
+    const events = buffer.split('\n\n')
+    buffer = events.pop()
+    for (const raw of events) {
+      let event = 'message'
+      let data = ''
+      for (const line of raw.split('\n')) {
+        if (line.startsWith('event:')) event = line.slice(6).trim()
+        else if (line.startsWith('data:')) data += line.slice(5).trim()
+      }
+      if (data) onEvent(event, JSON.parse(data))
+    }
+  }
+}
 
 const ChatInterface = ({ sessionId }) => {
   const [chunk, setChunk] = useState('') // State to hold the current chunk of text
   const [isImage, setIsImage] = useState(false) // State to track if the chunk is an image or text
   const [question, setQuestion] = useState('') // State to hold the question related to the current chunk
   const [questionType, setQuestionType] = useState('SAQ') // State to hold the type of question (SAQ or MCQ)
+  const [questionReady, setQuestionReady] = useState(false) // State to track if the question is complete (not streaming anymore)
   const [bloomLevel, setBloomLevel] = useState('') // State to hold the Bloom's taxonomy level
   const [answer, setAnswer] = useState('')  // State to hold the user's answer
   const [lastAnswer, setLastAnswer] = useState('')  // State to hold the last answer submitted by the user
@@ -26,11 +74,8 @@ const ChatInterface = ({ sessionId }) => {
   const hasFetched = useRef(false) // Ref to track if the first chunk has been fetched
   const currentChunkRef = useRef(null) // Ref to hold the current chunk of text
 
-  // Fetch the first chunk and question
-  const fetchNext = async () => {
-    const res = await fetch(`${BACKEND_URL}/chunk/${sessionId}`);
-    const data = await res.json()
-    
+  // Show the chunk and question of a /chunk response
+  const showChunk = (data) => {
     if (!data.is_retry) {
       setChunk(data.chunk);
       setIsImage(data.is_img);
@@ -41,13 +86,44 @@ const ChatInterface = ({ sessionId }) => {
 
     setQuestion(data.question)
     setProgress(data.progress)
-    setQuestion(data.question)
     setQuestionType(data.question_type)
     setBloomLevel(data.bloom_level)
+    setQuestionReady(true)
     setQuestionStartTime(Date.now())
-    setLoading(false)
-    setFileLoaded(true) 
-    
+  }
+
+  // Fetch the next chunk and question: the chunk is shown as soon as it is received and the question while it is generated
+  const fetchNext = async () => {
+    let type = 'SAQ'
+    let failed = false
+
+    await streamChunk(sessionId, (event, data) => {
+      if (event === 'chunk') {
+        type = data.question_type
+        showChunk({ ...data, question: type === 'MCQ' ? { question: '' } : '' })
+        setQuestionReady(false)
+        setLoading(false)
+        setFileLoaded(true)
+        setTimeout(() => {
+          currentChunkRef.current?.scrollIntoView({ behavior: 'smooth', block: 'start' });
+        }, 100);
+      } else if (event === 'question_delta') {
+        setQuestion(type === 'MCQ' ? { question: data.question } : data.question)
+      } else if (event === 'question') {
+        setQuestion(data.question)
+        setQuestionReady(true)
+        setQuestionStartTime(Date.now())
+      } else if (event === 'error') {
+        failed = true
+      }
+    })
+
+    // Fall back to the non-streaming endpoint, which retries the generation
+    if (failed) {
+      showChunk(await fetchChunk(sessionId))
+      setLoading(false)
+      setFileLoaded(true)
+    }
   }
 
   // Make sure to fetch the first chunk and question only once
@@ -117,28 +193,9 @@ const ChatInterface = ({ sessionId }) => {
     setLoadingMessage('Loading next chunk...');
     setLoading(true);
 
-    const res = await fetch(`${BACKEND_URL}/chunk/${sessionId}`);
-    const data = await res.json();
-
-    if (!data.is_retry) {
-      setChunk(data.chunk);
-      setIsImage(data.is_img);
-    } else {
-      setChunk('');
-      setIsImage(false);
-    }
-
-    setQuestion(data.question);
-    setQuestionType(data.question_type);
-    setBloomLevel(data.bloom_level);
-    setProgress(data.progress);
     setFeedback('');
-    setQuestionStartTime(Date.now());
     setShowFeedback(false);
-    setLoading(false);
-    setTimeout(() => {
-      currentChunkRef.current?.scrollIntoView({ behavior: 'smooth', block: 'start' });
-    }, 100);
+    await fetchNext();
   };
 
   
@@ -187,7 +244,7 @@ const ChatInterface = ({ sessionId }) => {
           <p className="text-sm text-gray-400">Chunk {idx + 1}</p>
           {msg.isImage ? (
             <img
-              src={`data:image/png;base64,${msg.chunk}`}
+              src={`${BACKEND_URL}${msg.chunk}`}
               alt={`PDF chunk ${idx + 1}`}
               className="w-full rounded-lg shadow-md"
             />
@@ -264,7 +321,7 @@ const ChatInterface = ({ sessionId }) => {
             <p className="text-sm text-gray-400">Current Chunk</p>
             {isImage ? (
               <img
-                src={`data:image/png;base64,${chunk}`}
+                src={`${BACKEND_URL}${chunk}`}
                 alt="Current PDF chunk"
                 className="w-full rounded-lg shadow-md"
               />
@@ -282,7 +339,11 @@ const ChatInterface = ({ sessionId }) => {
           </p>
 
           <form onSubmit={handleSubmit} className="flex flex-col space-y-4">
-            {questionType === 'MCQ' && (
+            {questionType === 'MCQ' && !questionReady && (
+              <p className="text-sm text-gray-400 italic">Generating the choices...</p>
+            )}
+
+            {questionType === 'MCQ' && questionReady && (
               <div className="space-y-2">
                 {Object.entries(question.choices).map(([key, val]) => (
                   <label key={key} className="block">
@@ -313,7 +374,8 @@ const ChatInterface = ({ sessionId }) => {
 
             <button
               type="submit"
-              className="bg-blue-600 text-white py-2 rounded-lg hover:bg-blue-700 font-semibold shadow-md"
+              disabled={!questionReady}
+              className="bg-blue-600 text-white py-2 rounded-lg hover:bg-blue-700 font-semibold shadow-md disabled:opacity-50"
             >
               Submit Answer
             </button>
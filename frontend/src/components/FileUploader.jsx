@@ -2,6 +2,7 @@ import { useCallback, useState } from 'react'
 import { useDropzone } from 'react-dropzone'
 
 const BACKEND_URL = import.meta.env.VITE_BACKEND_URL;
+const UPLOAD_POLL_INTERVAL = 1000 // Interval (ms) between two polls of the upload job status
 
 const FileUploader = ({ onUploadSuccess }) => {
   const [neo4jCredentials, setNeo4jCredentials] = useState({
@@ -14,6 +15,7 @@ const FileUploader = ({ onUploadSuccess }) => {
   })
   const [errorMessage, setErrorMessage] = useState('')
   const [loading, setLoading] = useState(false)
+  const [uploadStage, setUploadStage] = useState('')
   const [connecting, setConnecting] = useState(false)
   const [neo4jConnected, setNeo4jConnected] = useState(false)
   const [query, setQuery] = useState('')
@@ -37,11 +39,27 @@ const FileUploader = ({ onUploadSuccess }) => {
       })
 
       const data = await res.json()
-      onUploadSuccess(data.session_id)
+      if (!res.ok) throw new Error(data.message || 'Failed to upload the file.')
+
+      // The file is processed in the background, poll the job until the first chunks can be served
+      let job = data
+      while (!job.ready && (job.status === 'queued' || job.status === 'running')) {
+        await new Promise((resolve) => setTimeout(resolve, UPLOAD_POLL_INTERVAL))
+        const jobRes = await fetch(`${BACKEND_URL}/upload/${data.job_id}`)
+        job = await jobRes.json()
+        if (!jobRes.ok) throw new Error(job.message || 'Failed to process the file.')
+
+        const stage = Object.entries(job.stages || {}).reverse().find(([, progress]) => progress.total)
+        if (stage) setUploadStage(`${stage[0]} ${stage[1].done}/${stage[1].total}`)
+      }
+      if (!job.ready) throw new Error(job.error || 'Failed to process the file.')
+
+      onUploadSuccess(job.session_id)
     } catch (error) {
       setErrorMessage('Failed to upload and process the file.')
     } finally {
       setLoading(false)
+      setUploadStage('')
     }
   }, [onUploadSuccess])
 
@@ -123,6 +141,7 @@ const FileUploader = ({ onUploadSuccess }) => {
               <path className="opacity-75" fill="currentColor" d="M4 12a8 8 0 018-8V0C5.373 0 0 5.373 0 12h4z" />
             </svg>
             <p className="text-blue-600 font-semibold">Uploading and chunking your file...</p>
+            {uploadStage && <p className="text-gray-500 text-sm">{uploadStage}</p>}
           </div>
         </div>
       ) : neo4jConnected ? (